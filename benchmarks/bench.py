@@ -0,0 +1,257 @@
+"""Reproducible benchmarks for dirconfig's organize and watch paths.
+
+Generates a synthetic source tree, then measures:
+
+* organize_same_device: organize_files throughput with destinations inside the source
+* organize_cross_device: the same with destinations on another file system (e.g. tmpfs)
+* burst_latency: event-to-move latency for a burst of files dropped into a source
+  watched by a real 'dirconfig start' daemon
+
+Every scenario runs in its own process so peak RSS is measured in isolation.
+Results are written as JSON so runs can be compared across releases:
+
+    python benchmarks/bench.py --files 20000 --output results.json
+    python benchmarks/bench.py --cross-device-dir /dev/shm --burst 5000
+"""
+from contextlib import redirect_stdout
+import subprocess
+import argparse
+import platform
+import tempfile
+import logging
+import shutil
+import json
+import time
+import sys
+import os
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, PROJECT_DIR)
+
+def generate_tree(root, files, extensions, rules, depth=0, file_size=1024, cross_device_dir=None):
+    """Create a synthetic source tree and return the matching file-organization task.
+
+    Files are spread evenly over depth + 1 directory levels and cycle through
+    the extensions. Extensions are distributed over the rules round-robin.
+    """
+    source = os.path.join(root, 'source')
+    directories = [source]
+    for level in range(depth):
+        directories.append(os.path.join(directories[-1], f'level{level + 1}'))
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    payload = b'x' * file_size
+    for i in range(files):
+        path = os.path.join(directories[i % len(directories)], f'file{i}.ext{i % extensions}')
+        with open(path, 'wb') as f:
+            f.write(payload)
+
+    if cross_device_dir:
+        dest_root = tempfile.mkdtemp(prefix='dirconfig-bench-', dir=cross_device_dir)
+        # Destinations are relative to the source, so reach the other device with a relative path.
+        dest_base = os.path.relpath(dest_root, source)
+    else:
+        dest_base = 'organized'
+    task_rules = []
+    for k in range(rules):
+        exts = [f'.ext{m}' for m in range(extensions) if m % rules == k]
+        if exts:
+            task_rules.append({'extension': ', '.join(exts), 'destination': os.path.join(dest_base, f'dest{k}')})
+    return {'name': 'bench', 'type': 'file-organization', 'source': source, 'depth': depth, 'rules': task_rules}
+
+def peak_rss_bytes():
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+def run_organize(params):
+    """Child process body for the organize scenarios."""
+    import dirconfig
+    root = tempfile.mkdtemp(prefix='dirconfig-bench-')
+    task = None
+    try:
+        task = generate_tree(root, params['files'], params['extensions'], params['rules'],
+                             params['depth'], params['file_size'], params.get('cross_device_dir'))
+        dirconfig.move_executor = dirconfig.MoveExecutor(params['workers'], params['per_device'])
+        logging.disable(logging.CRITICAL)
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            moved = dirconfig.organize_files(task)
+        elapsed = time.perf_counter() - started
+        dirconfig.move_executor.shutdown()
+        return {
+            'files': params['files'],
+            'moved': moved,
+            'seconds': elapsed,
+            'files_per_second': moved / elapsed if elapsed else None,
+            'peak_rss_bytes': peak_rss_bytes(),
+        }
+    finally:
+        if task is not None and params.get('cross_device_dir'):
+            for rule in task['rules']:
+                shutil.rmtree(os.path.normpath(os.path.join(task['source'], rule['destination'], '..')), ignore_errors=True)
+        shutil.rmtree(root, ignore_errors=True)
+
+def run_burst_latency(params):
+    """Start a real daemon, drop a burst of files into its source and time each move."""
+    root = tempfile.mkdtemp(prefix='dirconfig-bench-')
+    try:
+        source = os.path.join(root, 'source')
+        os.makedirs(source)
+        config = {
+            'tasks': [{'name': 'bench', 'type': 'file-organization', 'source': source,
+                       'rules': [{'extension': '.dat', 'destination': 'organized'}]}],
+            'queue': {'debounce': params['debounce']},
+            'movers': {'workers': params['workers'], 'per_device': params['per_device']},
+        }
+        config_path = os.path.join(root, 'config.yaml')
+        with open(config_path, 'w') as f:
+            # JSON is valid YAML, so no yaml dependency is needed here.
+            json.dump(config, f)
+        pid_file = os.path.join(root, 'dirconfig.pid')
+        command = [sys.executable, '-c', 'import dirconfig; dirconfig.main()', 'start',
+                   '--config', config_path, '--pid', pid_file, '--log', os.path.join(root, 'dirconfig.log')]
+        daemon = subprocess.Popen(command, cwd=root, stdout=subprocess.DEVNULL, env=dict(os.environ, PYTHONPATH=PROJECT_DIR))
+        try:
+            deadline = time.monotonic() + 30
+            while not os.path.exists(pid_file):
+                if time.monotonic() > deadline or daemon.poll() is not None:
+                    raise RuntimeError("dirconfig daemon failed to start")
+                time.sleep(0.05)
+            # Let the startup reconciliation scan finish before the burst.
+            time.sleep(params['debounce'] + 0.5)
+
+            created = {}
+            payload = b'x' * params['file_size']
+            for i in range(params['burst']):
+                name = f'burst{i}.dat'
+                created[name] = time.monotonic()
+                with open(os.path.join(source, name), 'wb') as f:
+                    f.write(payload)
+
+            organized = os.path.join(source, 'organized')
+            seen = {}
+            deadline = time.monotonic() + params['timeout']
+            while len(seen) < len(created) and time.monotonic() < deadline:
+                if os.path.isdir(organized):
+                    now = time.monotonic()
+                    for entry in os.scandir(organized):
+                        seen.setdefault(entry.name, now)
+                time.sleep(0.01)
+            peak_rss = read_peak_rss(daemon.pid)
+        finally:
+            daemon.terminate()
+            daemon.wait(30)
+
+        latencies = sorted(seen[name] - created[name] for name in seen if name in created)
+        return {
+            'files': params['burst'],
+            'moved': len(latencies),
+            'debounce': params['debounce'],
+            'latency_seconds': {
+                'p50': percentile(latencies, 50),
+                'p95': percentile(latencies, 95),
+                'p99': percentile(latencies, 99),
+                'max': latencies[-1] if latencies else None,
+            },
+            'daemon_peak_rss_bytes': peak_rss,
+        }
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+def read_peak_rss(pid):
+    """Peak RSS of another process, where /proc is available."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def percentile(values, pct):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+SCENARIOS = {
+    'organize_same_device': run_organize,
+    'organize_cross_device': run_organize,
+    'burst_latency': run_burst_latency,
+}
+
+def run_scenario(name, params):
+    """Run a scenario in a fresh interpreter and return its result."""
+    with tempfile.NamedTemporaryFile('r', suffix='.json') as result:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name, json.dumps(params), result.name], check=True)
+        return json.load(result)
+
+def git_revision():
+    result = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, cwd=PROJECT_DIR)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+def package_version():
+    with open(os.path.join(PROJECT_DIR, '.bumpversion.cfg')) as f:
+        for line in f:
+            if line.startswith('current_version'):
+                return line.split('=', 1)[1].strip()
+    return None
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        _, _, name, params, result_path = sys.argv
+        result = SCENARIOS[name](json.loads(params))
+        with open(result_path, 'w') as f:
+            json.dump(result, f)
+        return
+
+    parser = argparse.ArgumentParser(description='dirconfig benchmarks')
+    parser.add_argument('--files', type=int, default=10000, help='Files in the synthetic source tree')
+    parser.add_argument('--extensions', type=int, default=20, help='Distinct file extensions')
+    parser.add_argument('--rules', type=int, default=10, help='Rules in the task')
+    parser.add_argument('--depth', type=int, default=0, help='Subdirectory levels to spread files over')
+    parser.add_argument('--file-size', type=int, default=1024, help='Bytes per file')
+    parser.add_argument('--workers', type=int, default=4, help='Move executor threads')
+    parser.add_argument('--per-device', type=int, default=2, help='Concurrent cross-device copies per device')
+    parser.add_argument('--cross-device-dir', help='Directory on another file system (e.g. /dev/shm) for the cross-device scenario')
+    parser.add_argument('--burst', type=int, default=1000, help='Files dropped into the watched source at once')
+    parser.add_argument('--debounce', type=float, default=0.5, help='Event queue debounce window for the burst scenario')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds to wait for a burst to be organized')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS), help='Scenario to run (default: all available)')
+    parser.add_argument('--output', help='Write results to this JSON file instead of stdout')
+    args = parser.parse_args()
+
+    params = {key: value for key, value in vars(args).items() if key not in ('scenario', 'output')}
+    scenarios = args.scenario or [name for name in SCENARIOS if name != 'organize_cross_device' or args.cross_device_dir]
+    results = {}
+    for name in scenarios:
+        scenario_params = dict(params)
+        if name != 'organize_cross_device':
+            scenario_params['cross_device_dir'] = None
+        elif not args.cross_device_dir:
+            parser.error('organize_cross_device requires --cross-device-dir')
+        print(f"Running {name}...", file=sys.stderr)
+        results[name] = run_scenario(name, scenario_params)
+
+    report = {
+        'version': package_version(),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'params': params,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
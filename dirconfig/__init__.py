@@ -1,79 +1,1998 @@
-from urbackup import urbackup_server, installer_os
-from watchdog.events import FileSystemEventHandler
-from watchdog.observers import Observer
-from threading import Thread, Event
+from threading import Thread, Event, Condition, Lock, BoundedSemaphore
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
 import subprocess
 import argparse
 import logging
+import fnmatch
 import signal
 import shutil
+import heapq
+import math
 import time
-import yaml
 import sys
 import os
+import re
+
+# Heavy dependencies (yaml, watchdog, urbackup, sqlite3, concurrent.futures,
+# hashlib, json, asyncio, multiprocessing) are imported inside the functions that need them so that
+# short-lived commands such as 'dirconfig stop' start quickly.
 
 # Global variables
 observer = None
-backup_thread = None # Thread for backup scheduling
-shutdown_event = Event()  # Event to signal shutdown to backup thread
+move_executor = None # Shared MoveExecutor, created on first use
+dedup_index = None # Shared DedupIndex, created on first use
+journal = None # Journal of snapshots and in-flight moves, opened by start_daemon
+urbackup_status_cache = {} # UrBackup command -> time until which the client is known to be running
+backup_scheduler = None # BackupScheduler running on the daemon's event loop
+daemon_loop = None # asyncio event loop of the running daemon
+shard = None # Shard of the sources this process organizes when it is a worker started with --workers
+placement_lock = Lock() # Serializes checking a destination name and moving a file to it
+shutdown_event = Event()  # Event to signal shutdown to helper threads
+reconcile_event = Event()  # Event to request a full reconciliation scan
+reload_event = Event()  # Event to request a config reload
 PID_FILE = 'dirconfig.pid' # Default PID file path
+LOG_FILE = 'dirconfig.log' # Default log file path
+ECHO = True # Whether messages are printed to the terminal as well as logged
 MODULE_DIR = os.path.dirname(os.path.abspath(__file__)) # Directory of the module
+QUEUE_DEFAULTS = {
+    'max_size': 10000,    # Maximum number of distinct paths waiting to be organized
+    'max_batch': 500,     # Maximum number of paths organized per worker tick
+    'debounce': 0.5,      # Seconds to let a burst settle before draining a batch
+    'block_timeout': 0.0, # Seconds the observer thread may wait on a full queue
+}
+STABILITY_DEFAULTS = {
+    'quiet': 2.0,           # Seconds size and mtime must stay unchanged where close events are unavailable
+    'close_timeout': 300.0, # Seconds without changes after which a file is released even without a close event
+    'interval': 1.0,        # Seconds between checks of files still being written
+}
+LOGGING_DEFAULTS = {
+    'format': 'text',           # 'text' or 'json' (one JSON object per line)
+    'max_bytes': 10 * 1024**2,  # Rotate the log file at this size; 0 disables rotation
+    'backups': 5,               # Rotated log files to keep
+    'print': True,              # Also print messages to the terminal
+    'summary_every': 0,         # Log one summary line per N moves instead of one line per move; 0 disables
+}
+SUMMARY_MAX_AGE = 60.0 # Seconds after which a move summary is logged even if it has fewer than N moves
+RECONCILE_FULL = 'full' # Scan every source
+RECONCILE_CHANGED = 'changed' # Scan only sources the journal does not know to be unchanged
+MOVE_TTL = 5.0 # Seconds during which events for a path moved by dirconfig are ignored
+MOVER_DEFAULTS = {
+    'workers': 4,    # Threads executing moves
+    'per_device': 2, # Concurrent cross-device copies per destination device
+}
+WATCH_DEFAULTS = {
+    'budget': 0.5,          # Share of fs.inotify.max_user_watches dirconfig may use
+    'fallback': 'polling',  # Watch for recursive sources over budget: 'polling' or 'flat' (top level only)
+    'poll_interval': 5.0,   # Seconds between polls of a polled source
+}
+POLL_MTIME_SLACK = 2.0 # Seconds within which a directory mtime may hide further changes (coarse NFS/SMB timestamps)
+DEDUP_MODES = ('drop', 'hardlink', 'rename') # What to do with a file whose content already exists in the destination
+HASH_CHUNK_SIZE = 1024 * 1024 # Bytes read at a time while hashing
+PARTIAL_HASH_SIZE = 64 * 1024 # Leading bytes hashed before deciding whether a full hash is needed
+HASH_WORKERS = 2 # Threads hashing dedup candidates
+SCAN_CHUNK_SIZE = 1000 # Moves handed to the executor at a time during a full scan
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, float('inf')) # Seconds
+URBACKUP_STATUS_TTL = 300.0 # Seconds a successful 'status' check is trusted
+BACKUP_DIR_WORKERS = 4 # Concurrent add-backupdir/remove-backupdir commands
+COMMAND_TIMEOUT = 300.0 # Seconds a UrBackup command may run inside the daemon before it is killed
+RESTART_DELAY = 1.0 # Seconds before a crashed worker is restarted; doubles while it keeps crashing
+RESTART_DELAY_MAX = 60.0 # Longest restart delay; a worker that ran this long starts over at RESTART_DELAY
+WORKER_STOP_TIMEOUT = 60.0 # Seconds a worker may take to shut down before it is killed
+STATS_INTERVAL = 5.0 # Seconds between the metric snapshots a worker sends to the supervisor
+BACKUP_INTERVALS = {
+    'hourly': 3600.0,
+    'daily': 86400.0,
+    'weekly': 7 * 86400.0,
+    'monthly': 30 * 86400.0,
+}
+SCHEDULER_DEFAULTS = {
+    'max_concurrent': 2, # Backups allowed to run at the same time
+    'catch_up': True,    # Run a missed backup once right after startup instead of skipping it
+}
+METRICS_DEFAULTS = {
+    'address': '127.0.0.1', # Interface the Prometheus endpoint listens on
+    'port': None,           # Port of the Prometheus endpoint; disabled when unset
+    'stats_file': None,     # File periodically rewritten with the same metrics; disabled when unset
+    'interval': 15,         # Seconds between stats file rewrites
+}
 
-class ChangeHandler(FileSystemEventHandler):
-    def __init__(self, tasks):
-        self.tasks = tasks
+def echo(*args):
+    """Print a message that is also logged, unless printing is turned off for the daemon."""
+    if ECHO:
+        print(*args)
 
-    def on_any_event(self, event):
-        for task in self.tasks:
+class JsonFormatter(logging.Formatter):
+    """Formats records as JSON lines: time, level, message and the record's structured fields."""
+    def format(self, record):
+        import json
+        entry = {'time': self.formatTime(record), 'level': record.levelname, 'message': record.getMessage()}
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+def setup_logging(path, logging_config=None, log_queue=None):
+    """Route log records through a queue to a background thread that writes the log file.
+
+    Returns the started QueueListener; stop it to flush the remaining records.
+    A multiprocessing queue lets worker processes log through the same listener.
+    """
+    global ECHO
+    import logging.handlers
+    import queue
+    logging_config = dict(LOGGING_DEFAULTS, **(logging_config or {}))
+    ECHO = logging_config['print']
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=int(logging_config['max_bytes']), backupCount=int(logging_config['backups']))
+    if logging_config['format'] == 'json':
+        file_handler.setFormatter(JsonFormatter())
+    else:
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    if log_queue is None:
+        log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+    listener = logging.handlers.QueueListener(log_queue, file_handler, respect_handler_level=True)
+    listener.start()
+    return listener
+
+def setup_worker_logging(log_queue, index, logging_config=None):
+    """Send a worker's log records to the supervisor, which writes them to the log file."""
+    global ECHO
+    import logging.handlers
+    ECHO = dict(LOGGING_DEFAULTS, **(logging_config or {}))['print']
+
+    def tag(record):
+        # Shows up in JSON logs; text logs stay as they are with a single process.
+        record.fields = dict(getattr(record, 'fields', {}), worker=index)
+        return True
+
+    handler = logging.handlers.QueueHandler(log_queue)
+    handler.addFilter(tag)
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+class MoveLog:
+    """Reports successful moves one line each or, per task, one summary line every N moves."""
+    def __init__(self):
+        self.default_every = LOGGING_DEFAULTS['summary_every']
+        self.every = {} # task label -> N
+        self.summaries = {} # task label -> [moves, bytes, started]
+        self.lock = Lock()
+
+    def configure(self, tasks, default_every=LOGGING_DEFAULTS['summary_every']):
+        """Take N from each task's 'summary_every', falling back to default_every."""
+        self.default_every = default_every
+        self.every = {task_label(task): task.get('summary_every', default_every) for task in tasks}
+
+    def moved(self, label, result):
+        every = self.every.get(label, self.default_every)
+        if not every:
+            file = os.path.basename(result.source)
+            echo(f"Moved: {file} -> {result.destination}")
+            logging.info(f"Moved: {file} -> {result.destination}", extra={'fields': {
+                'event': 'move', 'task': label, 'source': result.source, 'destination': result.destination, 'bytes': result.bytes}})
+            return
+        now = time.monotonic()
+        with self.lock:
+            summary = self.summaries.setdefault(label, [0, 0, now])
+            summary[0] += 1
+            summary[1] += result.bytes
+            if summary[0] < every and now - summary[2] < SUMMARY_MAX_AGE:
+                return
+            del self.summaries[label]
+        self._report(label, summary)
+
+    def flush(self, max_age=None):
+        """Report every summary that has moves not yet logged, or only those older than max_age seconds."""
+        now = time.monotonic()
+        with self.lock:
+            summaries = {label: summary for label, summary in self.summaries.items()
+                         if max_age is None or now - summary[2] >= max_age}
+            for label in summaries:
+                del self.summaries[label]
+        for label, summary in summaries.items():
+            self._report(label, summary)
+
+    def _report(self, label, summary):
+        moves, size, started = summary
+        message = f"Moved {moves} files ({size} bytes) for {label or 'dirconfig'} in {time.monotonic() - started:.1f}s"
+        echo(message)
+        logging.info(message, extra={'fields': {'event': 'move_summary', 'task': label, 'files': moves, 'bytes': size}})
+
+class Histogram:
+    """Cumulative histogram over fixed bucket upper bounds."""
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[position] += 1
+                break
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and histograms rendered in the Prometheus text format.
+
+    Every metric is identified by its name and a sorted tuple of label pairs.
+    Values that already live elsewhere (such as the queue depth) are registered
+    as callbacks and read only when the metrics are rendered.
+    """
+    PREFIX = 'dirconfig_'
+
+    def __init__(self):
+        self.lock = Lock()
+        self.kinds = {}
+        self.values = {}
+        self.callbacks = {}
+        self.remote = {} # Worker index -> samples last reported by that worker process
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.kinds.setdefault(name, 'counter')
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.kinds.setdefault(name, 'gauge')
+            self.values[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.kinds.setdefault(name, 'histogram')
+            if key not in self.values:
+                self.values[key] = Histogram()
+            self.values[key].observe(value)
+
+    def register(self, name, kind, callback, **labels):
+        """Report the value returned by callback() as a counter or gauge."""
+        with self.lock:
+            self.kinds.setdefault(name, kind)
+            self.callbacks[(name, tuple(sorted(labels.items())))] = callback
+
+    def get(self, name, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key in self.callbacks:
+                return self.callbacks[key]()
+            return self.values.get(key)
+
+    def reset(self):
+        with self.lock:
+            self.kinds.clear()
+            self.values.clear()
+            self.callbacks.clear()
+            self.remote.clear()
+
+    def snapshot(self):
+        """Return the metric kinds and a copy of every local sample, with callbacks read."""
+        import copy
+        with self.lock:
+            samples = {key: copy.deepcopy(value) if isinstance(value, Histogram) else value
+                       for key, value in self.values.items()}
+            for key, callback in self.callbacks.items():
+                samples[key] = callback()
+            return dict(self.kinds), samples
+
+    def update_remote(self, worker, kinds, samples):
+        """Replace the samples last reported by a worker process; they are rendered with a worker label."""
+        with self.lock:
+            for name, kind in kinds.items():
+                self.kinds.setdefault(name, kind)
+            self.remote[worker] = {(name, tuple(sorted(labels + (('worker', str(worker)),)))): value
+                                   for (name, labels), value in samples.items()}
+
+    def render(self):
+        kinds, samples = self.snapshot()
+        with self.lock:
+            for remote in self.remote.values():
+                samples.update(remote)
+        lines = []
+        for name in sorted(kinds):
+            metric = self.PREFIX + name
+            lines.append(f"# TYPE {metric} {kinds[name]}")
+            for (sample_name, labels), value in sorted(samples.items(), key=lambda item: item[0]):
+                if sample_name != name:
+                    continue
+                if isinstance(value, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f"{metric}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {value.sum}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {value.count}")
+                else:
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in labels)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + '}'
+
+metrics = Metrics()
+
+def task_label(task):
+    """Name used to label a task's metrics."""
+    return str(task.get('name') or task['source'])
+
+def start_metrics_exporter(metrics_config):
+    """Serve metrics over HTTP and/or rewrite a stats file, as configured. Returns the HTTP server, if any."""
+    server = None
+    if metrics_config.get('port') is not None:
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsRequestHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Scrapes are frequent; keep them out of the dirconfig log.
+                pass
+
+        server = ThreadingHTTPServer((metrics_config['address'], int(metrics_config['port'])), MetricsRequestHandler)
+        server.daemon_threads = True
+        Thread(target=server.serve_forever, name='dirconfig-metrics', daemon=True).start()
+        logging.info(f"Serving metrics on http://{metrics_config['address']}:{server.server_address[1]}/metrics")
+
+    if metrics_config.get('stats_file'):
+        Thread(target=_write_stats_file, args=(metrics_config['stats_file'], float(metrics_config['interval'])),
+               name='dirconfig-stats', daemon=True).start()
+    return server
+
+def _write_stats_file(path, interval):
+    while True:
+        temporary = f"{path}.tmp"
+        try:
+            with open(temporary, 'w') as f:
+                f.write(metrics.render())
+            os.replace(temporary, path)
+        except OSError as e:
+            logging.error(f"Failed to write stats file {path}: {e}")
+        if shutdown_event.wait(interval):
+            break
+
+class MoveRegistry:
+    """Short-lived record of paths touched by dirconfig's own moves.
+
+    A single move can produce several events (moved, or created/modified/deleted
+    across file systems). Entries therefore stay until their TTL expires instead
+    of being consumed by the first matching event.
+    """
+    def __init__(self, ttl=MOVE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = Lock()
+        self.next_purge = 0.0
+
+    def register(self, *paths, source=None):
+        """Record paths a move of the source file is about to touch."""
+        now = time.monotonic()
+        with self.lock:
+            if now >= self.next_purge:
+                self.entries = {path: entry for path, entry in self.entries.items() if entry[0] > now}
+                self.next_purge = now + self.ttl
+            for path in paths:
+                self.entries[path] = (now + self.ttl, source)
+
+    def __contains__(self, path):
+        entry = self.entries.get(path)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def origin(self, path):
+        """Return the source file of the move that touched path, or None if unknown."""
+        entry = self.entries.get(path)
+        return entry[1] if entry is not None and entry[0] > time.monotonic() else None
+
+move_registry = MoveRegistry()
+move_log = MoveLog()
+
+class EventQueue:
+    """Bounded, de-duplicating queue of paths waiting to be organized.
+
+    When the queue is full and the producer cannot wait any longer, the path is
+    dropped and the queue is marked as overflowed. The next batch handed to the
+    worker then asks for a single reconciliation scan instead of individual paths.
+    A reconciliation scan can also be requested explicitly with request_reconcile(),
+    for every source or only for some tasks.
+    """
+    def __init__(self, max_size=QUEUE_DEFAULTS['max_size']):
+        self.max_size = max_size
+        self.pending = OrderedDict()
+        self.condition = Condition()
+        self.overflowed = False
+        self.reconcile_requested = False
+        self.rescans = OrderedDict() # rules_version() of tasks to scan again, such as tasks changed by a reload
+        self.closed = False
+        self.notify = None # Called whenever work arrives, e.g. to wake an event loop
+        self.received_count = 0
+        self.coalesced_count = 0
+        self.overflow_count = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def put(self, path, timeout=0.0):
+        """Queue a path. Returns False if it was dropped because the queue is full."""
+        with self.condition:
+            self.received_count += 1
+            if path in self.pending:
+                self.coalesced_count += 1
+                return True
+            if len(self.pending) >= self.max_size:
+                # Backpressure: give the worker a chance to drain before dropping.
+                if not (timeout and self.condition.wait_for(lambda: len(self.pending) < self.max_size or self.closed, timeout)):
+                    if not self.overflowed:
+                        logging.warning(f"Event queue full ({self.max_size} paths). Falling back to a reconciliation scan.")
+                    self.overflowed = True
+                    self.reconcile_requested = RECONCILE_FULL
+                    self.overflow_count += 1
+                    self._notify()
+                    return False
+            self.pending[path] = None
+            self._notify()
+            return True
+
+    def _notify(self):
+        self.condition.notify_all()
+        if self.notify is not None:
+            self.notify()
+
+    def take_batch(self, max_batch=QUEUE_DEFAULTS['max_batch']):
+        """Return (paths, reconcile) for what is pending right now, without waiting.
+
+        If a reconciliation scan is due, every pending path is discarded (the scan
+        covers them) and reconcile is RECONCILE_FULL or RECONCILE_CHANGED. Scans of
+        single tasks come next, with reconcile the tuple of their rules_version().
+        """
+        with self.condition:
+            if self.reconcile_requested:
+                reconcile = self.reconcile_requested
+                self.pending.clear()
+                if reconcile == RECONCILE_FULL:
+                    self.rescans.clear()
+                self.overflowed = False
+                self.reconcile_requested = False
+                self.condition.notify_all()
+                return [], reconcile
+            if self.rescans:
+                versions = tuple(self.rescans)
+                self.rescans.clear()
+                return [], versions
+            batch = []
+            while self.pending and len(batch) < max_batch:
+                batch.append(self.pending.popitem(last=False)[0])
+            self.condition.notify_all()
+            return batch, False
+
+    def request_reconcile(self, skip_unchanged=False, versions=None):
+        """Ask for a scan of every source, or with versions only of the tasks with those rules_version()."""
+        with self.condition:
+            if versions is not None:
+                self.rescans.update((version, None) for version in versions)
+            # A forced scan always wins over one that may skip unchanged sources.
+            elif not skip_unchanged or not self.reconcile_requested:
+                self.reconcile_requested = RECONCILE_CHANGED if skip_unchanged else RECONCILE_FULL
+            self._notify()
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self._notify()
+
+def organize_batch(handler, batch, reconcile):
+    """Organize a batch taken from an EventQueue, or run the reconciliation scan it asks for."""
+    try:
+        if reconcile in (RECONCILE_FULL, RECONCILE_CHANGED):
+            handler.reconcile(skip_unchanged=reconcile == RECONCILE_CHANGED)
+        elif reconcile:
+            handler.reconcile(versions=reconcile)
+        elif batch:
+            handler.organize_paths(batch)
+    except Exception as e:
+        logging.error(f"Failed to organize batch of {len(batch)} paths: {e}")
+
+async def organize_events(handler, queue, max_batch=QUEUE_DEFAULTS['max_batch'], debounce=QUEUE_DEFAULTS['debounce']):
+    """Drain an EventQueue in batches until it is closed.
+
+    The observer thread wakes the event loop through the queue's notify hook.
+    Batches are organized on the loop's executor, so the loop stays responsive
+    while files are moved, and a batch in progress always runs to completion.
+    """
+    import asyncio
+    loop = asyncio.get_running_loop()
+    ready = asyncio.Event()
+    queue.notify = lambda: loop.call_soon_threadsafe(ready.set)
+    ready.set()
+    try:
+        while not queue.closed:
+            await ready.wait()
+            ready.clear()
+            # Let a burst settle so repeated events for a path collapse into one entry.
+            if debounce and not queue.closed:
+                await asyncio.sleep(debounce)
+            while not queue.closed:
+                batch, reconcile = queue.take_batch(max_batch)
+                if not batch and not reconcile:
+                    break
+                await loop.run_in_executor(None, organize_batch, handler, batch, reconcile)
+    finally:
+        queue.notify = None
+
+class StabilityGate:
+    """Holds new files back until they are completely written.
+
+    Where the observer reports close-after-write (inotify), a file that is
+    written to is released when it is closed or renamed into place. Elsewhere,
+    and for files that were never written to after they appeared (such as files
+    renamed in from an unwatched directory), a file is released once its size
+    and mtime stayed unchanged for the quiet period; a written file that is
+    never closed (such as a hard link) gets the same check after close_timeout.
+    Either way a file is released exactly once, however many events writing it
+    caused. Files dropped without a release are passed to forget.
+    """
+    def __init__(self, release, quiet=STABILITY_DEFAULTS['quiet'], close_timeout=STABILITY_DEFAULTS['close_timeout'],
+                 close_events=False, forget=None):
+        self.release = release
+        self.quiet = quiet
+        self.close_timeout = close_timeout
+        self.close_events = close_events
+        self.forget = forget
+        self.pending = {} # path -> [size, mtime_ns, unchanged since, close expected, written to]
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, path, close_expected=False):
+        with self.lock:
+            if path not in self.pending:
+                self.pending[path] = [None, None, time.monotonic(), close_expected, False]
+
+    def hold(self, path):
+        """Return True if a file found by a scan may still be written; the gate then releases it later."""
+        with self.lock:
+            if path in self.pending:
+                return True
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        # Scans see no events, so a recent mtime is the only sign of a writer.
+        if abs(time.time() - st.st_mtime) >= self.quiet:
+            return False
+        self.add(path)
+        return True
+
+    def touch(self, path):
+        """Note that a pending file was written to."""
+        with self.lock:
+            entry = self.pending.get(path)
+            if entry is not None:
+                entry[2] = time.monotonic()
+                entry[4] = True
+
+    def complete(self, path):
+        """Release a pending file right away, e.g. because it was closed after writing."""
+        with self.lock:
+            entry = self.pending.pop(path, None)
+        if entry is not None:
+            self.release(path)
+
+    def discard(self, path):
+        with self.lock:
+            entry = self.pending.pop(path, None)
+        if entry is not None and self.forget is not None:
+            self.forget(path)
+
+    def check(self):
+        """Release files whose size and mtime stopped changing and forget files that vanished."""
+        now = time.monotonic()
+        with self.lock:
+            items = list(self.pending.items())
+        ready = []
+        for path, entry in items:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.discard(path)
+                continue
+            with self.lock:
+                if self.pending.get(path) is not entry:
+                    continue
+                if entry[:2] != [st.st_size, st.st_mtime_ns]:
+                    entry[:3] = [st.st_size, st.st_mtime_ns, now]
+                elif now - entry[2] >= (self.close_timeout if entry[3] and entry[4] else self.quiet):
+                    del self.pending[path]
+                    ready.append(path)
+        for path in ready:
+            self.release(path)
+
+async def check_stability(gate, interval=STABILITY_DEFAULTS['interval']):
+    """Periodically release the files a StabilityGate has seen settle."""
+    import asyncio
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        await loop.run_in_executor(None, gate.check)
+
+async def report_move_summaries(interval=1.0):
+    """Log summaries that reached SUMMARY_MAX_AGE while no further moves came in."""
+    import asyncio
+    while True:
+        await asyncio.sleep(interval)
+        move_log.flush(SUMMARY_MAX_AGE)
+
+Routes = namedtuple('Routes', ['tasks', 'sources', 'excluded', 'max_depth'])
+
+class ChangeHandler:
+    """Routes watchdog events to the file-organization task that owns the event's directory.
+
+    Watchdog only requires event handlers to provide dispatch(), so this class
+    does not inherit from FileSystemEventHandler and importing dirconfig does
+    not import watchdog.
+    """
+    def __init__(self, tasks, queue=None, block_timeout=QUEUE_DEFAULTS['block_timeout'], gate=None):
+        # When a queue is given, events are handed to organize_events() instead
+        # of being organized synchronously on the observer thread.
+        self.queue = queue
+        self.block_timeout = block_timeout
+        # When a StabilityGate is given, new files wait in it until they are completely written.
+        self.gate = gate
+        self.events_received = 0
+        self.events_dropped = 0
+        self.event_times = {}
+        self.set_tasks(tasks)
+
+    def set_tasks(self, tasks):
+        """Build the routing table for tasks and swap it in with a single assignment.
+
+        Readers take self.routes once per call, so an event is always routed with
+        either the old or the new tasks, never a mix of both.
+        """
+        # Map each resolved source directory to the tasks watching it so an event
+        # can be routed with a single lookup instead of rescanning every source.
+        sources = {}
+        for task in tasks:
             if task['type'] == 'file-organization':
-                organize_files(task)
+                # Source paths are canonical, like the paths watch events carry.
+                sources.setdefault(get_rule_index(task).source_path, []).append(task)
+        # Destinations inside a watched source only ever receive files moved there
+        # by dirconfig itself, so events below them are dropped up front, unless
+        # another task organizes them (tasks chained through a destination).
+        indexes = [get_rule_index(task) for owned in sources.values() for task in owned]
+        excluded = set()
+        for index in indexes:
+            for destination in index.destinations:
+                if (any(is_subpath(destination, source) for source in sources)
+                        and not any(is_subpath(source, destination) for source in sources)
+                        and not any(other.owns(destination) for other in indexes)):
+                    excluded.add(destination.rstrip(os.sep) + os.sep)
+        max_depth = max([get_rule_index(task).depth for owned in sources.values() for task in owned] or [0])
+        self.routes = Routes(list(tasks), sources, tuple(sorted(excluded)), max_depth)
+
+    @property
+    def tasks(self):
+        return self.routes.tasks
+
+    @property
+    def sources(self):
+        return self.routes.sources
+
+    @property
+    def excluded(self):
+        return self.routes.excluded
+
+    def dispatch(self, event):
+        self.events_received += 1
+        metrics.inc('events_received_total')
+        path = event.dest_path if event.event_type == 'moved' else event.src_path
+        if path.startswith(self.excluded) or self.moved_by_dirconfig(path):
+            self.events_dropped += 1
+            metrics.inc('events_dropped_total', reason='self')
+            return
+        self.on_any_event(event)
+
+    def moved_by_dirconfig(self, path):
+        """Return True if path was just touched by a move of a task that also owns it.
+
+        A file moved into a directory that another task organizes is handed on
+        to that task, so tasks can be chained through their destinations.
+        """
+        if path not in move_registry:
+            return False
+        source = move_registry.origin(path)
+        if path.endswith('.dirconfig-tmp') or source is None:
+            return True
+        movers = {id(task) for task in self.owners(source)}
+        return all(id(task) in movers for task in self.owners(path))
+
+    def on_any_event(self, event):
+        if self.gate is not None and not event.is_directory and event.event_type in ('modified', 'closed'):
+            # Writes only matter for files the gate holds back, so no routing is needed.
+            if event.event_type == 'closed':
+                self.gate.complete(event.src_path)
+            else:
+                self.gate.touch(event.src_path)
+            return
+        if event.is_directory or event.event_type not in ('created', 'moved'):
+            metrics.inc('events_dropped_total', reason='ignored')
+            return
+        path = event.dest_path if event.event_type == 'moved' else event.src_path
+        owners = self.owners(path)
+        if not owners:
+            metrics.inc('events_dropped_total', reason='unowned')
+            return
+        metrics.inc('events_routed_total', task=task_label(owners[0]))
+        # Remember when the first event for the path arrived to measure event-to-move latency.
+        started = self.event_times.setdefault(path, time.monotonic())
+        if self.gate is not None:
+            if event.event_type == 'created':
+                # Events made up by a poller never come with a close event.
+                self.gate.add(path, self.gate.close_events and not getattr(event, 'is_synthetic', False))
+                return
+            # A file renamed into place, like a finished download, is complete.
+            self.gate.discard(event.src_path)
+            self.gate.discard(path)
+        if event.event_type == 'moved':
+            # The old name is never organized; the new one keeps its latency start.
+            self.event_times.pop(event.src_path, None)
+            self.event_times[path] = started
+        self.enqueue(path)
+
+    def forget(self, path):
+        """Drop what is kept about a path that will not be organized."""
+        self.event_times.pop(path, None)
+
+    def enqueue(self, path):
+        """Hand a complete file to the queue, or organize it right away without one."""
+        if self.queue is not None:
+            self.queue.put(path, self.block_timeout)
+        else:
+            self.organize_path(path)
+
+    def owners(self, path):
+        """Return the tasks that organize files in the path's directory."""
+        routes = self.routes
+        directory = os.path.dirname(path)
+        # Walk up at most max_depth levels looking for the nearest watched source.
+        for _ in range(routes.max_depth + 1):
+            tasks = routes.sources.get(directory)
+            if tasks:
+                return [task for task in tasks if get_rule_index(task).owns(os.path.dirname(path))]
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                break
+            directory = parent
+        return []
+
+    def organize_path(self, path):
+        """Organize a single path with the first owning task that has a matching rule."""
+        results = self.organize_paths([path])
+        return bool(results) and results[0].ok
+
+    def organize_paths(self, paths):
+        """Plan moves for a batch of paths and execute them together."""
+        moves = {}
+        for path in paths:
+            for task in self.owners(path):
+                label = task_label(task)
+                metrics.inc('files_scanned_total', task=label)
+                move = plan_move(task, path)
+                if move is not None:
+                    metrics.inc('files_matched_total', task=label)
+                    moves.setdefault(label, (task, []))[1].append(move)
+                    break
+        results = []
+        for label, (task, task_moves) in moves.items():
+            for result in execute_moves(task_moves, label, task.get('dedup')):
+                started = self.event_times.pop(result.source, None)
+                if result.ok and started is not None:
+                    metrics.observe('event_to_move_seconds', time.monotonic() - started, task=label)
+                results.append(result)
+        for path in paths:
+            self.event_times.pop(path, None)
+        return results
+
+    def reconcile(self, skip_unchanged=False, versions=None):
+        """Run a full scan of every source owned by this handler.
+
+        With skip_unchanged, sources the journal reports as unchanged since the
+        last clean shutdown are not scanned. With versions, only tasks whose
+        rules_version() is listed are scanned. A scan cut short by shutdown is
+        requested again, so the queue does not look drained.
+        """
+        if versions is None:
+            # Queued paths are covered by the scan, so their event times are stale.
+            self.event_times.clear()
+        for tasks in self.routes.sources.values():
+            for task in tasks:
+                if versions is not None and rules_version(task) not in versions:
+                    continue
+                index = get_rule_index(task)
+                if skip_unchanged and journal is not None and journal.is_unchanged(index):
+                    logging.info(f"Skipping unchanged source: {index.source_path}")
+                    continue
+                organize_files(task, self.gate)
+                if shutdown_event.is_set():
+                    if self.queue is not None:
+                        self.queue.request_reconcile(skip_unchanged, versions)
+                    return
 
 def load_config(config_path):
+    import yaml
     with open(config_path, 'r') as file:
-        return yaml.safe_load(file)
+        config = yaml.safe_load(file)
+    # Compile rules once so that matching a file never re-parses the config.
+    for task in (config or {}).get('tasks') or []:
+        if task.get('type') == 'file-organization':
+            task['rule_index'] = compile_rules(task)
+    return config
 
-def organize_files(task):
-    source = task['source']
+def resolve_source_path(source):
     # Use the current working directory as the base for relative paths.
     cwd = os.getcwd()
     
     # If the source is a relative path, resolve it based on the current working directory.
-    source_path = os.path.abspath(os.path.join(cwd, source)) if source.startswith(".") else os.path.abspath(source)
-    
-    rules = task['rules']
-    
-    for file in os.listdir(source_path):
-        file_extension = os.path.splitext(file)[1]
-        
-        for rule in rules:
-            extensions = [ext.strip() for ext in rule['extension'].split(',')]
-            
-            if file_extension in extensions:
-                # For destination paths starting with "/", treat them as absolute paths.
-                # Otherwise, treat as relative to the source directory.
-                if rule['destination'].startswith("/"):
-                    dest_path = os.path.abspath(rule['destination'][1:])
-                else:
-                    dest_path = os.path.abspath(os.path.join(source_path, rule['destination']))
-                
-                if not os.path.exists(dest_path):
-                    os.makedirs(dest_path)
-                
-                source_file_path = os.path.join(source_path, file)
-                dest_file_path = os.path.join(dest_path, file)
-                shutil.move(source_file_path, dest_file_path)
-                print(f"Moved: {file} -> {dest_file_path}")
-                logging.info(f"Moved: {file} -> {dest_file_path}")
-
-def signal_handler(signum, frame):
-    print("\nReceived interrupt signal. Stopping dirconfig...")
+    # Symlinks are resolved too: watches report canonical paths, so every comparison uses them.
+    return os.path.realpath(os.path.join(cwd, source)) if source.startswith(".") else os.path.realpath(source)
+
+def resolve_destination(rule, source_path):
+    # For destination paths starting with "/", treat them as absolute paths.
+    # Otherwise, treat as relative to the source directory.
+    if rule['destination'].startswith("/"):
+        return os.path.realpath(rule['destination'][1:])
+    return os.path.realpath(os.path.join(source_path, rule['destination']))
+
+def is_subpath(path, parent):
+    """Return True if path is parent itself or lies somewhere below it."""
+    return path == parent or path.startswith(parent.rstrip(os.sep) + os.sep)
+
+def parse_size(value):
+    """Convert a size such as 1024, '10KB' or '1.5 GB' to a number of bytes."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*', str(value), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid size: {value!r}")
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** ' KMGT'.index(unit.upper() or ' '))
+
+class CompiledRule:
+    """A rule with its destination resolved and its optional predicates compiled."""
+    __slots__ = ('position', 'destination', 'matchers', 'needs_stat', 'time_dependent')
+
+    def __init__(self, position, rule, source_path):
+        self.position = position
+        self.destination = resolve_destination(rule, source_path)
+        matchers = []
+        needs_stat = False
+        if 'glob' in rule:
+            matchers.append(_name_matcher(re.compile(fnmatch.translate(rule['glob'])).match))
+        if 'regex' in rule:
+            matchers.append(_name_matcher(re.compile(rule['regex']).search))
+        if 'min_size' in rule:
+            min_size = parse_size(rule['min_size'])
+            matchers.append(lambda name, st: st.st_size >= min_size)
+            needs_stat = True
+        if 'max_size' in rule:
+            max_size = parse_size(rule['max_size'])
+            matchers.append(lambda name, st: st.st_size <= max_size)
+            needs_stat = True
+        # Ages are given in seconds since the file was last modified.
+        if 'min_age' in rule:
+            min_age = float(rule['min_age'])
+            matchers.append(lambda name, st: time.time() - st.st_mtime >= min_age)
+            needs_stat = True
+        if 'max_age' in rule:
+            max_age = float(rule['max_age'])
+            matchers.append(lambda name, st: time.time() - st.st_mtime <= max_age)
+            needs_stat = True
+        self.matchers = tuple(matchers)
+        self.needs_stat = needs_stat
+        # Age predicates can start matching a file without the directory changing.
+        self.time_dependent = 'min_age' in rule or 'max_age' in rule
+
+    def matches(self, name, st):
+        for matcher in self.matchers:
+            if not matcher(name, st):
+                return False
+        return True
+
+def _name_matcher(match):
+    return lambda name, st: match(name) is not None
+
+class RuleIndex:
+    """Immutable index of a task's rules keyed by case-folded extension.
+
+    Every extension maps to the rules that can apply to it (including rules
+    without an extension, such as pure glob/regex rules) in config order, so the
+    common case of a plain extension rule is resolved with one dict lookup.
+    """
+    __slots__ = ('source_path', 'depth', 'excluded', 'rules', 'by_extension', 'fallback', 'fingerprint')
+
+    def __init__(self, rules, source_path, depth=0):
+        self.source_path = source_path
+        # Number of subdirectory levels below the source that are organized too.
+        self.depth = int(depth or 0)
+        self.rules = tuple(CompiledRule(position, rule, source_path) for position, rule in enumerate(rules or []))
+        # Identifies the configuration the index was compiled from.
+        import hashlib, json
+        self.fingerprint = hashlib.sha1(json.dumps([rules, self.depth], sort_keys=True, default=str).encode()).hexdigest()
+        by_extension = {}
+        fallback = []
+        for rule, compiled in zip(rules or [], self.rules):
+            extensions = [ext.strip().casefold() for ext in str(rule.get('extension') or '').split(',') if ext.strip()]
+            if not extensions:
+                fallback.append(compiled)
+            for ext in extensions:
+                by_extension.setdefault(ext, []).append(compiled)
+        # Rules without an extension apply to every file, so merge them into each
+        # extension's candidates while keeping the order rules were declared in.
+        self.by_extension = MappingProxyType({
+            ext: tuple(sorted(candidates + fallback, key=lambda rule: rule.position))
+            for ext, candidates in by_extension.items()
+        })
+        self.fallback = tuple(fallback)
+        # Destinations below the source are never scanned for files to organize.
+        self.excluded = tuple(sorted(
+            destination + os.sep for destination in self.destinations
+            if destination != source_path and is_subpath(destination, source_path)
+        ))
+
+    @property
+    def destinations(self):
+        return {rule.destination for rule in self.rules}
+
+    @property
+    def time_dependent(self):
+        return any(rule.time_dependent for rule in self.rules)
+
+    def owns(self, directory):
+        """Return True if files directly inside directory are organized by this task."""
+        if directory == self.source_path:
+            return True
+        if not self.depth or not is_subpath(directory, self.source_path):
+            return False
+        if (directory + os.sep).startswith(self.excluded):
+            return False
+        return os.path.relpath(directory, self.source_path).count(os.sep) < self.depth
+
+    def match(self, name, path=None, stat=None):
+        """Return the destination directory for a file name, or None if no rule matches.
+
+        stat may be given as a callable returning the file's stat result (such as
+        DirEntry.stat) so predicates can reuse cached information.
+        """
+        st = None
+        for rule in self.by_extension.get(os.path.splitext(name)[1].casefold(), self.fallback):
+            if not rule.matchers:
+                return rule.destination
+            if rule.needs_stat and st is None:
+                try:
+                    st = stat() if stat is not None else os.stat(path or os.path.join(self.source_path, name))
+                except FileNotFoundError:
+                    return None
+            if rule.matches(name, st):
+                return rule.destination
+        return None
+
+def compile_rules(task):
+    if task.get('dedup') not in (None,) + DEDUP_MODES:
+        raise ValueError(f"Invalid dedup mode: {task['dedup']!r}")
+    return RuleIndex(task['rules'], resolve_source_path(task['source']), task.get('depth', 0))
+
+def get_rule_index(task):
+    """Return the task's compiled rules, compiling them on first use if needed."""
+    index = task.get('rule_index')
+    if index is None:
+        index = task['rule_index'] = compile_rules(task)
+    return index
+
+def rules_version(task):
+    """Return (source path, rule fingerprint) of a task, which changes whenever a reload changes what it moves."""
+    index = get_rule_index(task)
+    return index.source_path, index.fingerprint
+
+def move_destination(move):
+    """Return the destination file of a (source file, destination directory[, name]) move."""
+    return os.path.join(move[1], move[2] if len(move) > 2 else os.path.basename(move[0]))
+
+MoveResult = namedtuple('MoveResult', ['source', 'destination', 'ok', 'bytes', 'error', 'seconds'], defaults=(0.0,))
+
+class MoveExecutor:
+    """Runs planned moves on a thread pool, grouped by source and destination device.
+
+    Moves within one file system are plain renames and are handed to the pool in
+    chunks. Moves across file systems are copied with kernel-side copies
+    (copy_file_range/sendfile where available), with at most per_device copies
+    writing to the same destination device at once.
+    """
+    RENAME_CHUNK = 256
+
+    def __init__(self, workers=MOVER_DEFAULTS['workers'], per_device=MOVER_DEFAULTS['per_device']):
+        self.workers = max(1, int(workers))
+        self.per_device = max(1, int(per_device))
+        from concurrent.futures import ThreadPoolExecutor
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dirconfig-mover')
+        self.device_slots = {}
+        self.lock = Lock()
+
+    def run(self, moves):
+        """Execute (source file, destination directory[, name]) moves and return a MoveResult per move, in order."""
+        results = [None] * len(moves)
+        groups = {}
+        for position, move in enumerate(moves):
+            source, dest_dir = move[:2]
+            destination = move_destination(move)
+            try:
+                st = os.stat(source)
+                os.makedirs(dest_dir, exist_ok=True)
+                dest_dev = os.stat(dest_dir).st_dev
+            except OSError as e:
+                results[position] = MoveResult(source, destination, False, 0, e)
+                continue
+            groups.setdefault((st.st_dev, dest_dev), []).append((position, source, destination, st.st_size))
+
+        jobs = []
+        for (source_dev, dest_dev), group in groups.items():
+            if source_dev == dest_dev:
+                for start in range(0, len(group), self.RENAME_CHUNK):
+                    jobs.append((self._rename_all, group[start:start + self.RENAME_CHUNK]))
+            else:
+                slots = self._device_slots(dest_dev)
+                jobs.extend((self._copy_all, [move], slots) for move in group)
+
+        # A single job is not worth a round trip through the pool.
+        if len(jobs) == 1:
+            outcomes = [jobs[0][0](*jobs[0][1:])]
+        else:
+            outcomes = [future.result() for future in [self.pool.submit(*job) for job in jobs]]
+        for outcome in outcomes:
+            for position, result in outcome:
+                results[position] = result
+        return results
+
+    def shutdown(self):
+        self.pool.shutdown(wait=True)
+
+    def _device_slots(self, device):
+        with self.lock:
+            if device not in self.device_slots:
+                self.device_slots[device] = BoundedSemaphore(self.per_device)
+            return self.device_slots[device]
+
+    def _rename_all(self, group):
+        outcome = []
+        for position, source, destination, size in group:
+            # Record the move first so the events it generates are recognized as our own.
+            move_registry.register(destination, source=source)
+            started = time.monotonic()
+            try:
+                destination = place_file(source, destination, source)
+                outcome.append((position, MoveResult(source, destination, True, size, None, time.monotonic() - started)))
+            except OSError as e:
+                outcome.append((position, MoveResult(source, destination, False, 0, e)))
+        return outcome
+
+    def _copy_all(self, group, slots):
+        outcome = []
+        for position, source, destination, size in group:
+            temporary = f"{destination}.dirconfig-tmp"
+            move_registry.register(destination, temporary, source=source)
+            started = time.monotonic()
+            try:
+                with slots:
+                    copy_file_fast(source, temporary)
+                shutil.copystat(source, temporary)
+                destination = place_file(temporary, destination, source)
+                os.unlink(source)
+                outcome.append((position, MoveResult(source, destination, True, size, None, time.monotonic() - started)))
+            except OSError as e:
+                if os.path.exists(temporary):
+                    os.unlink(temporary)
+                outcome.append((position, MoveResult(source, destination, False, 0, e)))
+        return outcome
+
+def place_file(path, destination, source):
+    """Move path to destination, or under a free name next to it if destination is taken.
+
+    Sources organized with depth can hold files of the same name in different
+    subdirectories; the second one must not replace the first. Returns the
+    destination used.
+    """
+    with placement_lock:
+        if os.path.lexists(destination):
+            directory, file = os.path.split(destination)
+            name = free_name(directory, file)
+            move_registry.register(os.path.join(directory, name), source=source)
+            echo(f"Name taken: {destination} exists, moving {os.path.basename(source)} as {name}")
+            logging.warning(f"Name taken: {destination} exists, moving {os.path.basename(source)} as {name}")
+            destination = os.path.join(directory, name)
+        os.replace(path, destination)
+    return destination
+
+def free_name(directory, file):
+    """Return a name that is free in directory for file, such as 'notes (2).txt'."""
+    stem, ext = os.path.splitext(file)
+    number = 2
+    while os.path.lexists(os.path.join(directory, f"{stem} ({number}){ext}")):
+        number += 1
+    return f"{stem} ({number}){ext}"
+
+def copy_file_fast(source, destination):
+    """Copy file contents inside the kernel when possible, falling back to a buffered copy."""
+    with open(source, 'rb') as fsrc, open(destination, 'wb') as fdst:
+        size = os.fstat(fsrc.fileno()).st_size
+        copied = 0
+        if hasattr(os, 'copy_file_range'):
+            try:
+                while copied < size:
+                    sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+            except OSError:
+                # Unsupported by the kernel or file system pair; try the next method.
+                pass
+        if copied < size and hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+            try:
+                while copied < size:
+                    sent = os.sendfile(fdst.fileno(), fsrc.fileno(), copied, size - copied)
+                    if sent == 0:
+                        break
+                    copied += sent
+            except OSError:
+                pass
+        if copied < size:
+            fsrc.seek(copied)
+            fdst.seek(copied)
+            shutil.copyfileobj(fsrc, fdst, 1024 * 1024)
+
+class Journal:
+    """On-disk journal of source snapshots and in-flight moves.
+
+    The journal is an SQLite database in WAL mode kept next to the PID file. A
+    move is recorded as pending before it starts and removed once it finished,
+    so moves interrupted by a crash can be resumed on the next start. Snapshots
+    of each source directory (mtime and inode) are written on a clean shutdown
+    and let the startup scan skip sources that did not change while dirconfig
+    was down.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = Lock()
+        import sqlite3
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS moves (source TEXT PRIMARY KEY, destination TEXT NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS snapshots (path TEXT PRIMARY KEY, mtime_ns INTEGER, inode INTEGER, fingerprint TEXT)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS backup_schedule (name TEXT PRIMARY KEY, next_run REAL NOT NULL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS hashes (path TEXT PRIMARY KEY, directory TEXT NOT NULL, '
+                                'inode INTEGER, size INTEGER, mtime_ns INTEGER, partial TEXT, digest TEXT)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS hashes_directory ON hashes (directory)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS backup_dirs (name TEXT NOT NULL, path TEXT NOT NULL, PRIMARY KEY (name, path))')
+
+    def begin_moves(self, moves):
+        """Record (source file, destination file) pairs as pending."""
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO moves (source, destination) VALUES (?, ?)', moves)
+
+    def finish_moves(self, sources):
+        with self.lock, self.connection:
+            self.connection.executemany('DELETE FROM moves WHERE source = ?', [(source,) for source in sources])
+
+    def pending_moves(self):
+        with self.lock:
+            return self.connection.execute('SELECT source, destination FROM moves').fetchall()
+
+    def save_snapshot(self, index):
+        """Remember the current state of a source so an unchanged source can be skipped on startup."""
+        st = os.stat(index.source_path)
+        with self.lock, self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO snapshots (path, mtime_ns, inode, fingerprint) VALUES (?, ?, ?, ?)',
+                (index.source_path, st.st_mtime_ns, st.st_ino, index.fingerprint))
+
+    def is_unchanged(self, index):
+        """Return True if the source matches its last snapshot and can be skipped."""
+        # Subdirectories and age predicates can change what matches without
+        # touching the source directory's own mtime.
+        if index.depth or index.time_dependent:
+            return False
+        with self.lock:
+            row = self.connection.execute(
+                'SELECT mtime_ns, inode, fingerprint FROM snapshots WHERE path = ?', (index.source_path,)).fetchone()
+        if row is None:
+            return False
+        try:
+            st = os.stat(index.source_path)
+        except OSError:
+            return False
+        return row == (st.st_mtime_ns, st.st_ino, index.fingerprint)
+
+    def load_backup_schedule(self):
+        """Return the persisted next-run time of every backup entry."""
+        with self.lock:
+            return dict(self.connection.execute('SELECT name, next_run FROM backup_schedule').fetchall())
+
+    def save_backup_run(self, name, next_run):
+        with self.lock, self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO backup_schedule (name, next_run) VALUES (?, ?)', (name, next_run))
+
+    def load_backup_dirs(self):
+        """Return {path: set of backup entry names} for the UrBackup directories dirconfig manages."""
+        owners = {}
+        with self.lock:
+            for name, path in self.connection.execute('SELECT name, path FROM backup_dirs').fetchall():
+                owners.setdefault(path, set()).add(name)
+        return owners
+
+    def track_backup_dirs(self, name, paths):
+        with self.lock, self.connection:
+            self.connection.executemany('INSERT OR IGNORE INTO backup_dirs (name, path) VALUES (?, ?)', [(name, path) for path in paths])
+
+    def untrack_backup_dirs(self, name, paths):
+        with self.lock, self.connection:
+            self.connection.executemany('DELETE FROM backup_dirs WHERE name = ? AND path = ?', [(name, path) for path in paths])
+
+    def load_hashes(self, directory):
+        """Return (name, inode, size, mtime_ns, partial, digest) for the hashed files of a destination."""
+        with self.lock:
+            rows = self.connection.execute(
+                'SELECT path, inode, size, mtime_ns, partial, digest FROM hashes WHERE directory = ?', (directory,)).fetchall()
+        return [(os.path.basename(path),) + tuple(row) for path, *row in rows]
+
+    def save_hashes(self, rows):
+        """Store (path, inode, size, mtime_ns, partial, digest) rows."""
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO hashes (path, directory, inode, size, mtime_ns, partial, digest) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(path, os.path.dirname(path)) + tuple(row) for path, *row in rows])
+
+    def forget_hashes(self, paths):
+        with self.lock, self.connection:
+            self.connection.executemany('DELETE FROM hashes WHERE path = ?', [(path,) for path in paths])
+
+    def recover(self):
+        """Resume moves that were interrupted by a crash. Returns the number resumed."""
+        resume = []
+        finished = []
+        for source, destination in self.pending_moves():
+            # Remove a partial cross-device copy; the move is redone from scratch.
+            temporary = f"{destination}.dirconfig-tmp"
+            if os.path.exists(temporary):
+                os.unlink(temporary)
+            if os.path.exists(source):
+                resume.append((source, os.path.dirname(destination), os.path.basename(destination)))
+            else:
+                finished.append(source)
+        self.finish_moves(finished)
+        if resume:
+            echo(f"Resuming {len(resume)} interrupted moves.")
+            logging.info(f"Resuming {len(resume)} interrupted moves.")
+            execute_moves(resume)
+        return len(resume)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+def get_journal_path(pid_file):
+    return os.path.splitext(pid_file)[0] + '.journal'
+
+def get_move_executor():
+    global move_executor
+    if move_executor is None:
+        move_executor = MoveExecutor()
+    return move_executor
+
+def hash_file(path, limit=None):
+    """Return the BLAKE2b digest of a file, or of its first limit bytes."""
+    import hashlib
+    digest = hashlib.blake2b()
+    remaining = limit
+    with open(path, 'rb') as f:
+        while remaining is None or remaining > 0:
+            chunk = f.read(HASH_CHUNK_SIZE if remaining is None else min(HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.hexdigest()
+
+class DedupEntry:
+    """A file in a destination: its (inode, size, mtime_ns) and the hashes computed so far."""
+    __slots__ = ('signature', 'partial', 'digest')
+
+    def __init__(self, signature, partial=None, digest=None):
+        self.signature = signature
+        self.partial = partial
+        self.digest = digest
+
+class DedupIndex:
+    """Content index of destination directories: size -> partial hash -> full hash.
+
+    A directory is only listed again when its mtime changed for a reason other
+    than dirconfig's own moves, which are added to the listing as they happen.
+    Its files are only hashed when their size collides with a file being moved
+    in. Hashes are kept, and persisted in the journal, until the file's inode,
+    size or mtime changes, so a destination is never rehashed as a whole.
+    """
+    def __init__(self, journal=None, workers=HASH_WORKERS):
+        self.journal = journal
+        self.workers = workers
+        self.directories = {} # directory -> (mtime_ns, {name: DedupEntry})
+        self.lock = Lock()
+        self.pool = None
+
+    def entries(self, directory):
+        """Return {name: DedupEntry} for the files in directory, refreshed if the directory changed."""
+        try:
+            st = os.stat(directory)
+        except OSError:
+            return {}
+        with self.lock:
+            cached = self.directories.get(directory)
+        if cached is not None and cached[0] == st.st_mtime_ns:
+            return cached[1]
+        if cached is not None:
+            known = cached[1]
+        elif self.journal is not None:
+            known = {name: DedupEntry(tuple(signature), partial, digest)
+                     for name, *signature, partial, digest in self.journal.load_hashes(directory)}
+        else:
+            known = {}
+        entries = {}
+        with os.scandir(directory) as listing:
+            for entry in listing:
+                if entry.name.endswith('.dirconfig-tmp'):
+                    continue
+                try:
+                    if not entry.is_file(follow_symlinks=False):
+                        continue
+                    entry_stat = entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                signature = (entry_stat.st_ino, entry_stat.st_size, entry_stat.st_mtime_ns)
+                previous = known.get(entry.name)
+                entries[entry.name] = previous if previous is not None and previous.signature == signature else DedupEntry(signature)
+        stale = [os.path.join(directory, name) for name, entry in known.items()
+                 if entry.partial is not None and entries.get(name) is not entry]
+        if stale and self.journal is not None:
+            self.journal.forget_hashes(stale)
+        with self.lock:
+            self.directories[directory] = (st.st_mtime_ns, entries)
+        return entries
+
+    def added(self, path):
+        """Add a file dirconfig just moved or linked into a listed directory, along with the directory's new mtime."""
+        directory, name = os.path.split(path)
+        with self.lock:
+            if directory not in self.directories:
+                return
+        try:
+            st = os.lstat(path)
+            directory_mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return
+        with self.lock:
+            cached = self.directories.get(directory)
+            if cached is not None:
+                cached[1][name] = DedupEntry((st.st_ino, st.st_size, st.st_mtime_ns))
+                self.directories[directory] = (directory_mtime, cached[1])
+
+    def find_duplicate(self, source, directory):
+        """Return the path of a file in directory with the same content as source, or None."""
+        try:
+            st = os.stat(source)
+        except OSError:
+            return None
+        entries = self.entries(directory)
+        # Listings are extended in place by added(), so read them under the lock.
+        with self.lock:
+            candidates = [(os.path.join(directory, name), entry) for name, entry in entries.items()
+                          if entry.signature[1] == st.st_size and os.path.join(directory, name) != source]
+        if not candidates:
+            return None
+        compared = candidates
+        mine = DedupEntry((st.st_ino, st.st_size, st.st_mtime_ns))
+        # A partial hash is enough for files no longer than the hashed prefix.
+        levels = ('partial',) if st.st_size <= PARTIAL_HASH_SIZE else ('partial', 'digest')
+        for level in levels:
+            self._hash([(source, mine)] + candidates, level)
+            wanted = getattr(mine, level)
+            candidates = [(path, entry) for path, entry in candidates if wanted is not None and getattr(entry, level) == wanted]
+            if not candidates:
+                break
+        if self.journal is not None:
+            self.journal.save_hashes([(path,) + entry.signature + (entry.partial, entry.digest)
+                                      for path, entry in compared if entry.partial is not None])
+        return candidates[0][0] if candidates else None
+
+    def _hash(self, files, level):
+        missing = [(path, entry) for path, entry in files if getattr(entry, level) is None]
+        limit = PARTIAL_HASH_SIZE if level == 'partial' else None
+        def compute(item):
+            path, entry = item
+            try:
+                setattr(entry, level, hash_file(path, limit))
+            except OSError:
+                pass
+        if len(missing) == 1:
+            compute(missing[0])
+        elif missing:
+            list(self._pool().map(compute, missing))
+        metrics.inc('files_hashed_total', len(missing), kind=level)
+
+    def _pool(self):
+        with self.lock:
+            if self.pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='dirconfig-hash')
+            return self.pool
+
+def get_dedup_index():
+    global dedup_index
+    if dedup_index is None or dedup_index.journal is not journal:
+        dedup_index = DedupIndex(journal)
+    return dedup_index
+
+def duplicate_name(directory, file):
+    """Return a free name for a duplicate of file in directory, such as 'report (duplicate).pdf'."""
+    stem, ext = os.path.splitext(file)
+    name = f"{stem} (duplicate){ext}"
+    number = 1
+    while os.path.lexists(os.path.join(directory, name)):
+        number += 1
+        name = f"{stem} (duplicate {number}){ext}"
+    return name
+
+def deduplicate_moves(moves, mode, label=''):
+    """Handle moves whose content already exists in the destination directory.
+
+    Depending on mode, a duplicate is dropped (the source is deleted), hard-linked
+    to the existing copy under its own name, or moved under a '(duplicate)' name.
+    Returns the moves still to execute and the results of the handled ones.
+    """
+    index = get_dedup_index()
+    remaining = []
+    handled = []
+    for move in moves:
+        source, dest_dir = move[:2]
+        existing = index.find_duplicate(source, dest_dir)
+        if existing is None:
+            remaining.append(move)
+            continue
+        file = os.path.basename(source)
+        metrics.inc('duplicates_total', task=label, action=mode)
+        if mode == 'rename':
+            name = duplicate_name(dest_dir, file)
+            echo(f"Duplicate: {file} matches {existing}, moving it as {name}")
+            logging.info(f"Duplicate: {file} matches {existing}, moving it as {name}")
+            remaining.append((source, dest_dir, name))
+            continue
+        destination = move_destination(move) if mode == 'hardlink' else existing
+        try:
+            if mode == 'hardlink' and destination != existing:
+                temporary = f"{destination}.dirconfig-tmp"
+                move_registry.register(destination, temporary, source=source)
+                os.link(existing, temporary)
+                destination = place_file(temporary, destination, source)
+                index.added(destination)
+            os.unlink(source)
+        except OSError as e:
+            echo(f"Failed to deduplicate {file} against {existing}: {e}")
+            logging.error(f"Failed to deduplicate {file} against {existing}: {e}")
+            handled.append(MoveResult(source, destination, False, 0, e))
+            continue
+        verb = 'dropped' if mode == 'drop' else f'hard-linked as {destination}'
+        echo(f"Duplicate: {file} matches {existing}, {verb}")
+        logging.info(f"Duplicate: {file} matches {existing}, {verb}")
+        handled.append(MoveResult(source, destination, True, 0, None))
+    return remaining, handled
+
+def execute_moves(moves, label='', dedup=None):
+    """Move (source file, destination directory[, name]) moves and report each outcome.
+
+    label names the task the moves belong to in the metrics. dedup is one of
+    DEDUP_MODES to check each file against the destination's content first.
+    """
+    handled = []
+    if dedup and moves:
+        moves, handled = deduplicate_moves(moves, dedup, label)
+    if not moves:
+        return handled
+    if journal is not None:
+        journal.begin_moves([(move[0], move_destination(move)) for move in moves])
+    results = get_move_executor().run(moves)
+    if journal is not None:
+        # Failed moves are settled too; only a crash leaves a move pending.
+        journal.finish_moves([result.source for result in results])
+    if dedup:
+        index = get_dedup_index()
+        for result in results:
+            if result.ok:
+                index.added(result.destination)
+    for result in results:
+        file = os.path.basename(result.source)
+        if result.ok:
+            metrics.inc('files_moved_total', task=label)
+            metrics.inc('bytes_moved_total', result.bytes, task=label)
+            metrics.observe('move_seconds', result.seconds, task=label)
+            move_log.moved(label, result)
+        elif not isinstance(result.error, FileNotFoundError):
+            metrics.inc('move_failures_total', task=label)
+            # A missing source only means another pass already moved the file.
+            echo(f"Failed to move {file} -> {result.destination}: {result.error}")
+            logging.error(f"Failed to move {file} -> {result.destination}: {result.error}", extra={'fields': {
+                'event': 'move_failed', 'task': label, 'source': result.source, 'destination': result.destination, 'error': str(result.error)}})
+    return handled + results
+
+def plan_move(task, file_path):
+    """Return the (source file, destination directory) move for a file, or None.
+
+    Paths outside the organized levels of the source, files that no longer exist
+    and files matching no rule produce no move.
+    """
+    index = get_rule_index(task)
+    # Sources are canonical; resolve the directory but not a symlinked file itself.
+    file_path = os.path.join(os.path.realpath(os.path.dirname(os.path.abspath(file_path))), os.path.basename(file_path))
+    if not index.owns(os.path.dirname(file_path)) or not os.path.isfile(file_path):
+        return None
+
+    dest_path = index.match(os.path.basename(file_path), file_path)
+    if dest_path is None:
+        return None
+    return file_path, dest_path
+
+def scan_source(index, chunk_size=SCAN_CHUNK_SIZE, label=''):
+    """Yield the moves planned for a source in lists of at most chunk_size.
+
+    Directories are streamed with os.scandir so memory stays flat no matter how
+    many entries they hold. Only regular files are considered, using the type
+    information cached on each DirEntry, and subdirectories are descended into
+    up to the index's depth, skipping destinations that live inside the source.
+    """
+    scanned = matched = 0
+    chunk = []
+    pending = [(index.source_path, 0)]
+    while pending:
+        directory, level = pending.pop()
+        try:
+            entries = os.scandir(directory)
+        except (FileNotFoundError, NotADirectoryError, PermissionError) as e:
+            logging.error(f"Failed to scan {directory}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_file():
+                        scanned += 1
+                        dest_path = index.match(entry.name, entry.path, entry.stat)
+                        if dest_path is not None:
+                            matched += 1
+                            chunk.append((entry.path, dest_path))
+                            if len(chunk) >= chunk_size:
+                                yield chunk
+                                chunk = []
+                    elif level < index.depth and entry.is_dir(follow_symlinks=False):
+                        if not (entry.path + os.sep).startswith(index.excluded):
+                            pending.append((entry.path, level + 1))
+                except OSError:
+                    # The entry vanished or cannot be inspected; skip it.
+                    continue
+    metrics.inc('files_scanned_total', scanned, task=label)
+    metrics.inc('files_matched_total', matched, task=label)
+    if chunk:
+        yield chunk
+
+def organize_files(task, gate=None):
+    """Scan the task's source and organize every matching file. Returns the number of files moved.
+
+    With a StabilityGate, files that may still be written are left to the gate.
+    """
+    label = task_label(task)
+    moved = 0
+    for chunk in scan_source(get_rule_index(task), label=label):
+        # Stop between chunks on shutdown; the rest is left to the next scan.
+        if shutdown_event.is_set():
+            break
+        if gate is not None:
+            chunk = [move for move in chunk if not gate.hold(move[0])]
+        moved += sum(result.ok for result in execute_moves(chunk, label, task.get('dedup')))
+    move_log.flush()
+    return moved
+
+def shutdown_signal_handler(stop):
+    # SIGINT and SIGTERM (sent by 'dirconfig stop') share this single shutdown path.
+    echo("\nReceived interrupt signal. Stopping dirconfig...")
     logging.info("Received interrupt signal. Stopping dirconfig...")
-    if observer is not None:
-        observer.stop()
-        observer.join()  # Ensure all threads are joined
-        if os.path.exists(PID_FILE):
-            os.remove(PID_FILE)
-        sys.exit(0)
+    stop.set()
+
+def reconcile_signal_handler(signum=None, frame=None):
+    # Defer the scan to the control loop so it never runs inside the signal handler.
+    logging.info("Received reconciliation signal. Scheduling a full scan...")
+    reconcile_event.set()
+
+def reload_signal_handler(signum=None, frame=None):
+    # Like reconciliation, the reload itself happens in the control loop.
+    logging.info("Received reload signal. Reloading configuration...")
+    reload_event.set()
+
+def install_signal_handlers(loop, stop):
+    """Hand SIGINT, SIGTERM, SIGUSR1 and SIGHUP over to the daemon's event loop."""
+    handlers = {signal.SIGINT: lambda: shutdown_signal_handler(stop),
+                signal.SIGTERM: lambda: shutdown_signal_handler(stop)}
+    # SIGUSR1 (full reconciliation scan) and SIGHUP (config reload) are not available on Windows
+    if hasattr(signal, 'SIGUSR1'):
+        handlers[signal.SIGUSR1] = reconcile_signal_handler
+    if hasattr(signal, 'SIGHUP'):
+        handlers[signal.SIGHUP] = reload_signal_handler
+    for signum, callback in handlers.items():
+        try:
+            loop.add_signal_handler(signum, callback)
+        except NotImplementedError:
+            # Event loops on Windows cannot watch signals; pass them on from a plain handler.
+            signal.signal(signum, lambda signum, frame, callback=callback: loop.call_soon_threadsafe(callback))
+
+class ConfigFileHandler:
+    """Watchdog handler that requests a reload when the config file is written or replaced.
+
+    Where the observer reports close-after-write (inotify), a reload waits for
+    the file to be closed instead of following every write, so a config saved
+    in several writes is never read half-written.
+    """
+
+    def __init__(self, config_path, close_events=False):
+        # Events carry canonical paths because the config directory is watched by its real path.
+        self.config_path = os.path.realpath(config_path)
+        self.event_types = ('closed', 'moved') if close_events else ('created', 'modified', 'moved')
+
+    def dispatch(self, event):
+        if event.is_directory or event.event_type not in self.event_types:
+            return
+        # Editors often save by writing a temporary file and renaming it over the original.
+        if self.config_path in (event.src_path, getattr(event, 'dest_path', None)):
+            reload_event.set()
+
+def inotify_watch_limit():
+    """Return fs.inotify.max_user_watches, or None where inotify is not used."""
+    try:
+        with open('/proc/sys/fs/inotify/max_user_watches') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+def count_directories(path, limit):
+    """Count path and the directories below it, stopping once the count exceeds limit."""
+    count = 0
+    stack = [path]
+    while stack and count <= limit:
+        directory = stack.pop()
+        count += 1
+        try:
+            with os.scandir(directory) as entries:
+                stack.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+        except OSError:
+            pass
+    return count
+
+class DirectorySnapshot:
+    """Compact snapshot of a directory tree for file systems without change notifications.
+
+    Each directory keeps its own mtime and inode plus (inode, size, mtime) for
+    its files. Creating, removing or renaming an entry updates the directory's
+    mtime, so a directory whose mtime did not change is not listed again and a
+    poll of an unchanged tree costs one stat per directory.
+    """
+    __slots__ = ('root', 'depth', 'skip', 'directories', 'primed')
+
+    def __init__(self, root, depth=0, skip=()):
+        self.root = root
+        self.depth = depth
+        self.skip = skip # Directory prefixes (ending in os.sep) that are never polled
+        self.directories = {} # path -> (mtime_ns or None, inode, {name: (inode, size, mtime_ns)}, subdirectories)
+        self.primed = False
+
+    def poll(self):
+        """Return the files that appeared or changed since the previous poll.
+
+        The first poll only records the tree.
+        """
+        changed = []
+        seen = set()
+        stack = [(self.root, 0)]
+        now = time.time_ns()
+        while stack:
+            path, level = stack.pop()
+            seen.add(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            cached = self.directories.get(path)
+            if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_ino:
+                subdirectories = cached[3]
+            else:
+                files, subdirectories = {}, []
+                try:
+                    with os.scandir(path) as entries:
+                        for entry in entries:
+                            try:
+                                if entry.is_dir(follow_symlinks=False):
+                                    subdirectories.append(entry.path)
+                                elif entry.is_file():
+                                    entry_stat = entry.stat()
+                                    files[entry.name] = (entry_stat.st_ino, entry_stat.st_size, entry_stat.st_mtime_ns)
+                            except OSError:
+                                pass
+                except OSError:
+                    continue
+                previous = cached[2] if cached is not None else ({} if self.primed else None)
+                if previous is not None:
+                    changed.extend(os.path.join(path, name) for name, signature in files.items() if previous.get(name) != signature)
+                # A directory modified within the timestamp granularity can change again
+                # without a new mtime, so it is listed again on the next poll.
+                recent = now - stat.st_mtime_ns < POLL_MTIME_SLACK * 1e9
+                self.directories[path] = (None if recent else stat.st_mtime_ns, stat.st_ino, files, subdirectories)
+            if level < self.depth:
+                stack.extend((subdirectory, level + 1) for subdirectory in subdirectories
+                             if not (subdirectory + os.sep).startswith(self.skip))
+        for path in [path for path in self.directories if path not in seen]:
+            del self.directories[path]
+        self.primed = True
+        return changed
+
+def poll_depth(handler, path):
+    """Return how many levels below path the handler's tasks organize."""
+    depth = 0
+    for source, tasks in handler.sources.items():
+        if is_subpath(source, path):
+            nesting = source[len(path):].strip(os.sep).count(os.sep) + 1 if source != path else 0
+            depth = max([depth] + [nesting + get_rule_index(task).depth for task in tasks])
+    return depth
+
+class PollingWatcher(Thread):
+    """Observer-like poller built on DirectorySnapshot, for NFS, SMB and FUSE sources.
+
+    Only files that appeared or changed are handed to the handler, as created
+    events, so they take the same path as events from the regular observer.
+    """
+    def __init__(self, interval=WATCH_DEFAULTS['poll_interval']):
+        super().__init__(name='dirconfig-poller', daemon=True)
+        self.interval = interval
+        self.watches = {} # path -> (handler, DirectorySnapshot)
+        self.lock = Lock()
+        self.stopped = Event()
+
+    def schedule(self, handler, path, recursive=False):
+        snapshot = DirectorySnapshot(path, poll_depth(handler, path), handler.excluded)
+        # Record the tree right away so files arriving before the first poll are not missed.
+        snapshot.poll()
+        with self.lock:
+            self.watches[path] = (handler, snapshot)
+        return path
+
+    def unschedule(self, watch):
+        with self.lock:
+            self.watches.pop(watch, None)
+
+    def remove_handler_for_watch(self, handler, watch):
+        self.unschedule(watch)
+
+    def poll(self):
+        from watchdog.events import FileCreatedEvent
+        with self.lock:
+            watches = list(self.watches.values())
+        for handler, snapshot in watches:
+            # The handler's tasks can change on a config reload.
+            snapshot.depth = poll_depth(handler, snapshot.root)
+            snapshot.skip = handler.excluded
+            started = time.monotonic()
+            for path in snapshot.poll():
+                event = FileCreatedEvent(path)
+                event.is_synthetic = True
+                handler.dispatch(event)
+            metrics.observe('poll_seconds', time.monotonic() - started)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logging.error(f"Polling failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+
+class WatchManager:
+    """Keeps one watch per canonical source directory, within the inotify watch budget.
+
+    A recursive inotify watch costs one kernel watch per directory in the tree,
+    and every process of the user shares fs.inotify.max_user_watches. Recursive
+    sources that do not fit the budget fall back to a polling watch, or to a
+    non-recursive one if polling is disabled. Tasks with 'watch: polling' are
+    always polled, for file systems that inotify cannot see changes on.
+    """
+
+    def __init__(self, observer, handler, config=None):
+        self.observer = observer
+        self.handler = handler
+        self.config = dict(WATCH_DEFAULTS, **(config or {}))
+        self.watches = {} # (path, mode) -> watch returned by the observer
+        self.keep = set() # Watches shared with other handlers
+        self.polling_observer = None
+        self.watch_count = 0
+
+    def plan(self, tasks):
+        """Return the {path: mode} watches the tasks need and the inotify watches they use."""
+        sources = {}
+        polled = set()
+        for task in tasks:
+            if task['type'] == 'file-organization':
+                index = get_rule_index(task)
+                path = index.source_path
+                # Unless a task organizes subdirectories (depth), only the top level of a source
+                # is organized, so a non-recursive watch keeps destination events out entirely.
+                sources[path] = sources.get(path, False) or index.depth > 0
+                if task.get('watch') == 'polling':
+                    polled.add(path)
+        # A recursive watch already reports events for every directory below it,
+        # except for polled sources, which are often separate (network) mounts.
+        # Whether a source is covered is only known once its roots got their
+        # watches: a root that falls back to a flat watch covers nothing below it.
+        roots = sorted(path for path, recursive in sources.items() if recursive and path not in polled)
+        flat = [path for path, recursive in sources.items() if not recursive and path not in polled]
+
+        limit = inotify_watch_limit()
+        budget = None if limit is None else int(limit * self.config['budget'])
+        plan = {path: 'polling' for path in polled}
+        # Flat sources outside every root need their watch whatever happens to the roots.
+        used = sum(not any(is_subpath(path, root) for root in roots) for path in flat)
+        watched = []
+        # Sorted, so a root is planned before the sources nested in it.
+        for path in roots:
+            if any(is_subpath(path, root) for root in watched):
+                continue
+            left = None if budget is None else budget - used
+            needed = 1 if budget is None else count_directories(path, left)
+            if budget is None or needed <= left:
+                plan[path] = 'recursive'
+                watched.append(path)
+                used += needed
+                continue
+            plan[path] = 'polling' if self.config['fallback'] == 'polling' else 'flat'
+            used += plan[path] == 'flat'
+            echo(f"Warning: watching {path} recursively needs more than the {left} inotify watches left, using a {plan[path]} watch instead")
+            logging.warning(f"Watching {path} recursively needs more than the {left} inotify watches left, using a {plan[path]} watch instead")
+        for path in flat:
+            if not any(is_subpath(path, root) for root in watched):
+                if any(is_subpath(path, root) for root in roots):
+                    used += 1
+                plan[path] = 'flat'
+        return plan, used
+
+    def get_observer(self, mode):
+        if mode != 'polling':
+            return self.observer
+        if self.polling_observer is None:
+            self.polling_observer = PollingWatcher(self.config['poll_interval'])
+            self.polling_observer.start()
+        return self.polling_observer
+
+    def schedule(self, handler, path):
+        """Non-recursively watch path for another handler, sharing the source watch if there is one."""
+        key = (os.path.realpath(path), 'flat')
+        self.keep.add(key)
+        return self.observer.schedule(handler, key[0], recursive=False)
+
+    def sync(self, tasks=None):
+        """Schedule and unschedule watches to match tasks, by default the handler's current ones.
+
+        New watches are added first; if one of them fails, the ones already added
+        are removed again and the error is raised with the old watches intact.
+        """
+        plan, used = self.plan(self.handler.tasks if tasks is None else tasks)
+        wanted = set(plan.items())
+        added = []
+        try:
+            for key in sorted(wanted - set(self.watches)):
+                path, mode = key
+                self.watches[key] = self.get_observer(mode).schedule(self.handler, path, recursive=mode != 'flat')
+                added.append(key)
+        except Exception:
+            for key in added:
+                self._unschedule(key)
+            raise
+        for key in added:
+            logging.info(f"Watching {key[0]} ({key[1]})")
+        for key in [key for key in self.watches if key not in wanted]:
+            self._unschedule(key)
+            logging.info(f"Stopped watching {key[0]}")
+        self.watch_count = used
+        limit = inotify_watch_limit()
+        if limit is not None:
+            logging.info(f"Using about {used} of {limit} inotify watches (fs.inotify.max_user_watches)")
+
+    def _unschedule(self, key):
+        watch = self.watches.pop(key)
+        if key in self.keep:
+            self.observer.remove_handler_for_watch(self.handler, watch)
+        else:
+            self.get_observer(key[1]).unschedule(watch)
+
+    def stop(self):
+        if self.polling_observer is not None:
+            self.polling_observer.stop()
+            self.polling_observer.join()
+
+def reload_config(config_path, handler, watch_manager):
+    """Re-read the config and apply task and backup changes to the running daemon.
+
+    The observer keeps running: only watches of added or removed sources change
+    and the handler switches to the new rules in one step, so in-flight moves
+    finish under the rules they were planned with. The new watches are set up
+    before the switch. Returns the new config, or None if it could not be
+    loaded or watched and the old one stays in effect.
+    """
+    global backup_scheduler
+    try:
+        config = load_config(config_path)
+        if not isinstance(config, dict):
+            raise ValueError("expected a mapping with a 'tasks' list")
+        tasks = owned_tasks(config.get('tasks') or [])
+        previous = {rules_version(task) for task in handler.tasks if task['type'] == 'file-organization'}
+        changed = [task for task in tasks if task['type'] == 'file-organization' and rules_version(task) not in previous]
+        watch_manager.sync(tasks)
+    except Exception as e:
+        echo(f"Failed to reload {config_path}, keeping the current configuration: {e}")
+        logging.error(f"Failed to reload {config_path}, keeping the current configuration: {e}")
+        return None
+    handler.set_tasks(tasks)
+    move_log.configure(tasks, move_log.default_every)
+    # Only new or changed rules can match files that are already in place. The
+    # scans run on the event queue, so they never hold up the daemon's control loop.
+    if changed and handler.queue is not None:
+        handler.queue.request_reconcile(versions=[rules_version(task) for task in changed])
+
+    if backup_scheduler is not None:
+        backup_scheduler.set_entries(config.get('backup'))
+    elif config.get('backup') and runs_backups():
+        backup_scheduler = BackupScheduler(config['backup'], config.get('scheduler'), journal)
+        backup_scheduler.start(daemon_loop)
+    echo(f"Reloaded {config_path}: {len(changed)} new or changed tasks")
+    logging.info(f"Reloaded {config_path}: {len(changed)} new or changed tasks")
+    metrics.inc('config_reloads_total')
+    return config
         
 def get_urbackup_command(os_name=None):
     if os.name == 'nt' and os_name != 'Linux':  # Windows
@@ -98,22 +2017,77 @@ def add_to_path(new_path_entry):
         # Execute the PowerShell command
         result = subprocess.run(["powershell", "-Command", powershell_command], capture_output=True, text=True)
         if result.returncode == 0:
-            print(result.stdout.strip())
+            echo(result.stdout.strip())
             logging.info(result.stdout.strip())
         else:
-            print("Failed to modify the system PATH:", result.stderr)
+            echo("Failed to modify the system PATH:", result.stderr)
             logging.error("Failed to modify the system PATH: " + result.stderr)
     except Exception as e:
-        print(f"An error occurred: {e}")
+        echo(f"An error occurred: {e}")
         logging.error(f"An error occurred: {str(e)}")
 
 def get_installer_filename(os_type):
+    from urbackup import installer_os
     return "urbackup_client_installer" + (".exe" if os_type.lower() is installer_os.Windows else ".sh")
 
+def run_command(cmd):
+    """Run a UrBackup command and return its subprocess.CompletedProcess.
+
+    Inside the daemon, calls from worker threads run the command as an asyncio
+    subprocess on the daemon's event loop, which kills it after COMMAND_TIMEOUT
+    seconds and on shutdown. Elsewhere it is a plain subprocess.run().
+    """
+    loop = daemon_loop
+    if loop is not None and loop.is_running() and not _on_loop(loop):
+        import asyncio
+        try:
+            return asyncio.run_coroutine_threadsafe(run_command_async(cmd, COMMAND_TIMEOUT), loop).result()
+        except RuntimeError:
+            pass # The loop closed in the meantime
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+def _on_loop(loop):
+    import asyncio
+    try:
+        return asyncio.get_running_loop() is loop
+    except RuntimeError:
+        return False
+
+async def run_command_async(cmd, timeout=COMMAND_TIMEOUT):
+    """Run cmd with asyncio and return a CompletedProcess, killing it after timeout seconds."""
+    import asyncio
+    process = await asyncio.create_subprocess_exec(*cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+        process.kill()
+        if isinstance(e, asyncio.CancelledError):
+            raise
+        await process.wait()
+        logging.error(f"Command {' '.join(cmd)} timed out after {timeout} seconds")
+        return subprocess.CompletedProcess(cmd, process.returncode, '', f"Timed out after {timeout} seconds")
+    return subprocess.CompletedProcess(cmd, process.returncode, stdout.decode(errors='replace'), stderr.decode(errors='replace'))
+
+def urbackup_client_running():
+    """Return True if the UrBackup client reports its status.
+
+    A positive answer is cached for URBACKUP_STATUS_TTL seconds so frequent
+    backup cycles do not spawn a status process every time.
+    """
+    command = get_urbackup_command()
+    if urbackup_status_cache.get(command, 0) > time.monotonic():
+        return True
+    result = run_command([command, "status"])
+    if result.returncode == 0:
+        urbackup_status_cache[command] = time.monotonic() + URBACKUP_STATUS_TTL
+        return True
+    urbackup_status_cache.pop(command, None)
+    return False
+
 def check_and_install_urbackup_client(backup_config):
-    result = subprocess.run([get_urbackup_command(), "status"], capture_output=True, text=True)
-    if result.returncode != 0:
-        print("UrBackup client not running. Attempting installation...")
+    from urbackup import urbackup_server
+    if not urbackup_client_running():
+        echo("UrBackup client not running. Attempting installation...")
         logging.info("UrBackup client not running. Attempting installation...")
         # Determine OS type for choosing the correct installer
         os_type = "Linux" if os.name != 'nt' else "Windows"
@@ -132,29 +2106,107 @@ def check_and_install_urbackup_client(backup_config):
                 # Add urbackupclientctl to PATH if Windows
                 if os_type == 'Windows':
                     add_to_path('C:\\Program Files\\UrBackup\\')
-                print("Installation successful.")
+                echo("Installation successful.")
                 logging.info("Installation successful.")
             else:
-                print("Failed to download installer.")
+                echo("Failed to download installer.")
                 logging.error("Failed to download installer.")
         else:
-            print("Failed to log in to the backup server.")
+            echo("Failed to log in to the backup server.")
             logging.error("Failed to log in to the backup server.")
     else:
-        print("UrBackup client is running.")
+        echo("UrBackup client is running.")
         logging.info("UrBackup client is running.")
 
+def parse_backup_dirs(output):
+    """Parse the output of 'list-backupdirs' into a list of paths.
+
+    Both JSON output and the tabular output (a header line followed by one
+    directory per line, columns separated by two or more spaces) are accepted.
+    """
+    import json
+    try:
+        data = json.loads(output)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        data = data.get('dirs', data.get('directories'))
+    if isinstance(data, list):
+        return [item['path'] if isinstance(item, dict) else str(item) for item in data]
+
+    directories = []
+    for line in output.splitlines():
+        path = re.split(r'\s{2,}|\t', line.strip())[0]
+        # Skip headers, separators and messages; backup paths are absolute.
+        if os.path.isabs(path) or re.match(r'^[A-Za-z]:[\\/]', path):
+            directories.append(path)
+    return directories
+
+def list_backup_dirs():
+    """Return the directories UrBackup currently backs up, or None if they cannot be listed."""
+    result = run_command([get_urbackup_command(), "list-backupdirs"])
+    if result.returncode != 0:
+        echo(f"Failed to list backup directories. Error: {result.stderr}")
+        logging.error(f"Failed to list backup directories. Error: {result.stderr}")
+        return None
+    return parse_backup_dirs(result.stdout)
+
+def _change_backup_dir(action, directory):
+    cmd = [get_urbackup_command(), f"{action}-backupdir", "--path", directory]
+    result = run_command(cmd)
+    verb = "added" if action == "add" else "removed"
+    if result.returncode == 0:
+        echo(f"Successfully {verb} backup directory: {directory}")
+        logging.info(f"Successfully {verb} backup directory: {directory}")
+    else:
+        echo(f"Failed to {action} backup directory: {directory}. Error: {result.stderr}")
+        logging.error(f"Failed to {action} backup directory: {directory}. Error: {result.stderr}")
+    return result.returncode == 0
+
 def setup_backup_dirs(backup_config):
-    """Add directories specified in config to UrBackup."""
-    for directory in backup_config['directories']:
-        cmd = [get_urbackup_command(), "add-backupdir", "--path", directory]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            print(f"Successfully added backup directory: {directory}")
-            logging.info(f"Successfully added backup directory: {directory}")
-        else:
-            print(f"Failed to add backup directory: {directory}. Error: {result.stderr}")
-            logging.error(f"Failed to add backup directory: {directory}. Error: {result.stderr}")
+    """Add directories specified in config to UrBackup.
+
+    The registered directories are listed once and only the difference is
+    applied: missing directories are added and, unless 'prune' is false,
+    directories this entry added earlier but no longer lists are removed.
+    The journal records which entries added which directories, so the
+    directories of other entries, or ones added to UrBackup by hand, are left
+    alone. The add/remove commands run concurrently on a small pool.
+    """
+    key = lambda path: os.path.normcase(os.path.normpath(path))
+    name = backup_config.get('name', '')
+    wanted = {key(directory): directory for directory in backup_config['directories']}
+    owners = journal.load_backup_dirs() if journal is not None else {}
+    registered = list_backup_dirs()
+    stale = []
+    if registered is None:
+        # Without a listing, fall back to adding everything (adding is idempotent).
+        changes = [("add", directory) for directory in wanted.values()]
+    else:
+        current = {key(directory): directory for directory in registered}
+        changes = [("add", directory) for path, directory in wanted.items() if path not in current]
+        if backup_config.get('prune', True):
+            stale = [path for path, names in owners.items() if name in names and path not in wanted]
+            # A directory another entry still lists stays registered.
+            changes += [("remove", current[path]) for path in stale if path in current and owners[path] == {name}]
+    if not changes:
+        logging.info("Backup directories are up to date.")
+        results = []
+    elif len(changes) == 1:
+        results = [_change_backup_dir(*changes[0])]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=min(BACKUP_DIR_WORKERS, len(changes))) as pool:
+            results = list(pool.map(lambda change: _change_backup_dir(*change), changes))
+    if journal is None:
+        return
+    failed = {key(directory) for (action, directory), ok in zip(changes, results) if action == "remove" and not ok}
+    journal.untrack_backup_dirs(name, [path for path in stale if path not in failed])
+    # Only directories that were not registered before are ours, plus those shared with another entry.
+    ours = [path for path in wanted if path in owners]
+    if registered is not None:
+        ours += [key(directory) for (action, directory), ok in zip(changes, results) if action == "add" and ok]
+    journal.track_backup_dirs(name, ours)
 
 def initiate_backup(backup_type, client_name):
     """Initiate the backup process using the urbackupclientctl command with detailed options."""
@@ -167,65 +2219,553 @@ def initiate_backup(backup_type, client_name):
         get_urbackup_command(), "start", backup_option,
         "--non-blocking", "--client", client_name
     ]
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    result = run_command(cmd)
     if result.returncode == 0:
-        print(f"Successfully started {backup_type} backup for {client_name}.")
+        echo(f"Successfully started {backup_type} backup for {client_name}.")
         logging.info(f"Successfully started {backup_type} backup for {client_name}.")
     else:
-        print(f"Failed to start {backup_type} backup for {client_name}. Error: {result.stderr}")
+        echo(f"Failed to start {backup_type} backup for {client_name}. Error: {result.stderr}")
         logging.error(f"Failed to start {backup_type} backup for {client_name}. Error: {result.stderr}")
 
+def get_backup_interval(schedule):
+    """Convert a schedule (daily, weekly, monthly or a number of seconds) to seconds."""
+    if isinstance(schedule, (int, float)):
+        return float(schedule)
+    if schedule not in BACKUP_INTERVALS:
+        raise ValueError(f"Invalid backup schedule: {schedule!r}")
+    return BACKUP_INTERVALS[schedule]
+
+def set_backup_retention(backup_config):
+    """Limit the number of backups UrBackup keeps to cover 'retention' days."""
+    interval_days = get_backup_interval(backup_config.get('schedule', 'daily')) / 86400
+    count = max(1, math.ceil(float(backup_config['retention']) / interval_days))
+    kind = 'image' if 'image' in backup_config['type'] else 'file'
+    level = 'incr' if 'incremental' in backup_config['type'] else 'full'
+    key = f"max_{kind}_{level}"
+    cmd = [get_urbackup_command(), "set-settings", "-k", key, "-v", str(count)]
+    result = run_command(cmd)
+    if result.returncode == 0:
+        echo(f"Set retention for {backup_config['name']}: keep {count} backups ({key}).")
+        logging.info(f"Set retention for {backup_config['name']}: keep {count} backups ({key}).")
+    else:
+        echo(f"Failed to set retention for {backup_config['name']}. Error: {result.stderr}")
+        logging.error(f"Failed to set retention for {backup_config['name']}. Error: {result.stderr}")
+
+def next_backup_run(due, interval, now, catch_up=True):
+    """Return when a backup that was due at 'due' should run next, given the time is now.
+
+    A run that is not yet due keeps its time. A missed run either happens right
+    away (catch_up) or is skipped to the next slot on the original cadence.
+    Several missed runs never turn into several catch-up runs.
+    """
+    if due > now:
+        return due
+    if catch_up:
+        return now
+    missed = math.floor((now - due) / interval) + 1
+    return due + missed * interval
+
+class BackupScheduler:
+    """Runs every backup entry on its schedule from the daemon's event loop.
+
+    Next-run times are kept in a heap and persisted to the journal, so missed
+    runs after downtime can be caught up or skipped. The scheduler sleeps until
+    the earliest run is due (or until it is woken up), and runs are handed to a
+    small pool capped at max_concurrent so one slow backup cannot delay others.
+    """
+    def __init__(self, entries, scheduler_config=None, journal=None):
+        scheduler_config = dict(SCHEDULER_DEFAULTS, **(scheduler_config or {}))
+        self.catch_up = scheduler_config['catch_up']
+        self.max_concurrent = max(1, int(scheduler_config['max_concurrent']))
+        self.journal = journal
+        self.loop = None
+        self.wakeup = None
+        self.future = None
+        self.stopped = False
+        self.lock = Lock()
+        self.running = set()
+        self.heap = []
+        self.pool = None
+        self.set_entries(entries)
+
+    def set_entries(self, entries):
+        """Replace the scheduled entries, keeping the next run of entries that still exist."""
+        if isinstance(entries, dict):
+            entries = [entries]
+        persisted = self.journal.load_backup_schedule() if self.journal is not None else {}
+        now = time.time()
+        with self.lock:
+            scheduled = {entry['name']: due for due, _, entry in self.heap}
+            self.entries = {entry['name']: entry for entry in entries or []}
+            self.heap = []
+            for position, (name, entry) in enumerate(self.entries.items()):
+                interval = get_backup_interval(entry.get('schedule', 'daily'))
+                if name in scheduled:
+                    due = scheduled[name]
+                elif name in persisted:
+                    due = next_backup_run(persisted[name], interval, now, entry.get('catch_up', self.catch_up))
+                else:
+                    # New entries run right away, like the first backup on startup always did.
+                    due = now
+                heapq.heappush(self.heap, (due, position, entry))
+        self._wake()
+
+    def _wake(self):
+        # set_entries() and stop() may be called from any thread, e.g. during a config reload.
+        loop = self.loop
+        if loop is not None:
+            loop.call_soon_threadsafe(self.wakeup.set)
+
+    def start(self, loop):
+        """Run the scheduler on loop. May be called from any thread."""
+        import asyncio
+        self.future = asyncio.run_coroutine_threadsafe(self.run(), loop)
+
+    async def join(self):
+        import asyncio
+        if self.future is not None:
+            await asyncio.wrap_future(self.future)
+
+    async def run(self):
+        import asyncio
+        from concurrent.futures import ThreadPoolExecutor
+        self.loop = asyncio.get_running_loop()
+        self.wakeup = asyncio.Event()
+        self.pool = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='dirconfig-backup')
+        try:
+            while not self.stopped:
+                with self.lock:
+                    delay = self.heap[0][0] - time.time() if self.heap else None
+                    if delay is not None and delay <= 0:
+                        due, position, entry = heapq.heappop(self.heap)
+                        self._dispatch(entry)
+                        interval = get_backup_interval(entry.get('schedule', 'daily'))
+                        next_run = next_backup_run(due + interval, interval, time.time(), False)
+                        heapq.heappush(self.heap, (next_run, position, entry))
+                        if self.journal is not None:
+                            self.journal.save_backup_run(entry['name'], next_run)
+                        continue
+                # Sleep until the next run is due; set_entries() and stop() wake us early.
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                self.wakeup.clear()
+        finally:
+            self.loop = None
+            self.pool.shutdown(wait=False)
+
+    def _dispatch(self, entry):
+        name = entry['name']
+        if name in self.running:
+            echo(f"Skipping backup {name}: the previous run is still in progress.")
+            logging.warning(f"Skipping backup {name}: the previous run is still in progress.")
+            return
+        self.running.add(name)
+        self.pool.submit(self._run_backup, entry)
+
+    def _run_backup(self, entry):
+        try:
+            backup_task(entry)
+        except Exception as e:
+            echo(f"Backup {entry['name']} failed: {e}")
+            logging.error(f"Backup {entry['name']} failed: {e}")
+        finally:
+            with self.lock:
+                self.running.discard(entry['name'])
+
+    def stop(self):
+        self.stopped = True
+        self._wake()
+
 def backup_task(backup_config):
     """Performs the entire backup task from checking/installing client to starting backups."""
-    check_and_install_urbackup_client(backup_config)
-    setup_backup_dirs(backup_config)
-    initiate_backup(backup_config['type'], backup_config['name'])
+    started = time.monotonic()
+    status = 'error'
+    try:
+        check_and_install_urbackup_client(backup_config)
+        setup_backup_dirs(backup_config)
+        if backup_config.get('retention') is not None:
+            set_backup_retention(backup_config)
+        initiate_backup(backup_config['type'], backup_config['name'])
+        status = 'ok'
+    finally:
+        name = backup_config.get('name', '')
+        metrics.inc('backup_runs_total', backup=name, status=status)
+        metrics.observe('backup_seconds', time.monotonic() - started, backup=name)
     
-def start_daemon(config_path):
-    global observer
+Shard = namedtuple('Shard', ['index', 'count', 'log_queue', 'stats_queue'])
+
+def shard_tasks(tasks, worker, count):
+    """Return the tasks that worker (of count workers) organizes.
+
+    Tasks are sharded by source, so every source is watched by exactly one
+    worker. A source nested in another source, or receiving files from another
+    source's task, stays with that source: a single worker has to see both to
+    route their events and to drop the ones caused by its own moves. Groups
+    are dealt out to the workers in path order, so every worker computes the
+    same shards from the same config. Tasks of other types run in the first worker.
+    """
+    organized = [task for task in tasks if task['type'] == 'file-organization']
+    sources = sorted({get_rule_index(task).source_path for task in organized})
+    groups = {source: source for source in sources}
+
+    def find(path):
+        while groups[path] != path:
+            path = groups[path]
+        return path
+
+    for task in organized:
+        index = get_rule_index(task)
+        path = index.source_path
+        for other in sources:
+            if is_subpath(path, other) or any(is_subpath(destination, other) for destination in index.destinations):
+                first, second = find(path), find(other)
+                # Groups are named after their first path, which is the outermost source.
+                groups[max(first, second)] = min(first, second)
+
+    roots = sorted({find(source) for source in sources})
+    owned = []
+    for task in tasks:
+        if task['type'] != 'file-organization':
+            if worker == 0:
+                owned.append(task)
+        elif roots.index(find(get_rule_index(task).source_path)) % count == worker:
+            owned.append(task)
+    return owned
+
+def owned_tasks(tasks):
+    """Return the tasks this process organizes: all of them, or its shard when it is a worker."""
+    if shard is None:
+        return tasks
+    return shard_tasks(tasks, shard.index, shard.count)
+
+def runs_backups():
+    """Backups are scheduled by a single process: the daemon, or its first worker."""
+    return shard is None or shard.index == 0
+
+def read_pid_file(path):
+    """Return the PIDs in a PID file: the daemon's first, then those of its workers, if any."""
+    with open(path, 'r') as f:
+        return [int(pid) for pid in f.read().split()]
+
+def write_pid_file(path, pids):
+    with open(path, 'w') as f:
+        f.write('\n'.join(map(str, pids)))
+
+class WorkerGroup:
+    """The worker processes of a sharded daemon, restarted with a growing delay when they crash.
+
+    Workers are started as target(index, count, *args). A worker only exits on
+    its own when something went wrong, so check() restarts it, waiting twice as
+    long each time it crashes again soon after starting.
+    """
+    def __init__(self, count, target, args=(), context=None):
+        import multiprocessing
+        self.count = count
+        self.target = target
+        self.args = tuple(args)
+        self.context = context or multiprocessing.get_context('spawn')
+        self.processes = [None] * count
+        self.started = [0.0] * count
+        self.delays = [RESTART_DELAY] * count
+        self.restart_at = [0.0] * count
+        self.restarts = 0
+
+    def start(self, index):
+        process = self.context.Process(target=self.target, args=(index, self.count) + self.args,
+                                       name=f'dirconfig-worker-{index}')
+        process.start()
+        self.processes[index] = process
+        self.started[index] = time.monotonic()
+        logging.info(f"Started worker {index} (PID {process.pid})")
+
+    def check(self):
+        """Start workers that are due to be (re)started. Returns True if any was started."""
+        now = time.monotonic()
+        started = False
+        for index, process in enumerate(self.processes):
+            if process is not None:
+                if process.is_alive():
+                    continue
+                delay = RESTART_DELAY if now - self.started[index] >= RESTART_DELAY_MAX else self.delays[index]
+                self.delays[index] = min(delay * 2, RESTART_DELAY_MAX)
+                self.restart_at[index] = now + delay
+                self.processes[index] = None
+                self.restarts += 1
+                metrics.inc('worker_restarts_total', worker=str(index))
+                echo(f"Worker {index} exited with code {process.exitcode}, restarting it in {delay:.0f}s")
+                logging.error(f"Worker {index} exited with code {process.exitcode}, restarting it in {delay:.0f}s")
+            if now >= self.restart_at[index]:
+                self.start(index)
+                started = True
+        return started
+
+    def running(self):
+        return sum(process is not None and process.is_alive() for process in self.processes)
+
+    def pids(self):
+        return [process.pid for process in self.processes if process is not None]
+
+    def send_signal(self, signum):
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                os.kill(process.pid, signum)
+
+    def stop(self, timeout=WORKER_STOP_TIMEOUT):
+        """Ask every worker to shut down, and kill those still running after timeout seconds."""
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for index, process in enumerate(self.processes):
+            if process is None:
+                continue
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logging.warning(f"Worker {index} did not stop within {timeout:.0f}s, killing it")
+                process.kill()
+                process.join()
+
+def run_worker(index, count, config_path, pid_file, log_queue, stats_queue):
+    """Entry point of a worker process: run the daemon for one shard of the sources."""
+    global shard, PID_FILE
+    import asyncio
+    PID_FILE = pid_file
+    shard = Shard(index, count, log_queue, stats_queue)
+    asyncio.run(run_daemon(config_path))
+
+async def report_metrics(stats_queue, index, interval=STATS_INTERVAL):
+    """Send this worker's metrics to the supervisor every interval seconds."""
+    import asyncio
+    while True:
+        stats_queue.put((index,) + metrics.snapshot())
+        await asyncio.sleep(interval)
+
+def collect_worker_metrics(stats_queue):
+    """Feed metric snapshots sent by workers into the supervisor's metrics until None arrives."""
+    for snapshot in iter(stats_queue.get, None):
+        metrics.update_remote(*snapshot)
+
+async def supervise(config_path, workers):
+    """Run the daemon as a group of worker processes, each organizing its shard of the sources.
+
+    Every worker owns its watches, queue and movers. The supervisor writes the
+    log records of all workers, serves their metrics with a worker label and
+    restarts workers that crash. SIGINT and SIGTERM stop the whole group;
+    SIGHUP and SIGUSR1 are passed on to the workers.
+    """
+    global journal, move_executor
+    import multiprocessing
+    import asyncio
     config = load_config(config_path)
-    tasks = config['tasks']
+    context = multiprocessing.get_context('spawn')
+    log_queue, stats_queue = context.Queue(), context.Queue()
+    group = WorkerGroup(workers, run_worker, (config_path, PID_FILE, log_queue, stats_queue), context)
+    log_listener = setup_logging(LOG_FILE, config.get('logging'), log_queue)
+    # Workers share the journal; resume interrupted moves before any of them scans its sources.
+    journal = Journal(get_journal_path(PID_FILE))
+    journal.recover()
+    journal.close()
+    journal = None
+    if move_executor is not None:
+        move_executor.shutdown()
+        move_executor = None
+    metrics_server = start_metrics_exporter(dict(METRICS_DEFAULTS, **(config.get('metrics') or {})))
+    metrics.register('workers_running', 'gauge', group.running)
+    collector = Thread(target=collect_worker_metrics, args=(stats_queue,), name='dirconfig-worker-metrics', daemon=True)
+    collector.start()
+
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    install_signal_handlers(loop, stop)
+    echo(f"Starting {workers} workers.")
+    logging.info(f"Starting {workers} workers.")
+    try:
+        while not stop.is_set():
+            if group.check():
+                write_pid_file(PID_FILE, [os.getpid()] + group.pids())
+            if reload_event.is_set():
+                reload_event.clear()
+                group.send_signal(signal.SIGHUP)
+            if reconcile_event.is_set():
+                reconcile_event.clear()
+                group.send_signal(signal.SIGUSR1)
+            try:
+                await asyncio.wait_for(stop.wait(), 1)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        shutdown_event.set()
+        await loop.run_in_executor(None, group.stop)
+        stats_queue.put(None)
+        collector.join()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        logging.info(f"Workers restarted: {group.restarts}")
+        if os.path.exists(PID_FILE):
+            os.remove(PID_FILE)
+        log_listener.stop()
+
+def start_daemon(config_path, workers=1):
+    import asyncio
+    if workers > 1:
+        asyncio.run(supervise(config_path, workers))
+    else:
+        asyncio.run(run_daemon(config_path))
+
+async def run_daemon(config_path):
+    """The daemon runtime: one event loop drives organizing, backups, reloads and shutdown.
+
+    Watchdog's observer thread hands events to the loop through the EventQueue,
+    blocking work (moves, scans, backups) runs on executors, and SIGINT/SIGTERM
+    only set the stop event, so every shutdown takes the same path.
+    """
+    global observer, move_executor, journal, backup_scheduler, daemon_loop
+    import asyncio
+    config = load_config(config_path)
+    tasks = owned_tasks(config['tasks'])
+    logging_config = dict(LOGGING_DEFAULTS, **(config.get('logging') or {}))
+    if shard is None:
+        log_listener = setup_logging(LOG_FILE, logging_config)
+    else:
+        log_listener = None
+        setup_worker_logging(shard.log_queue, shard.index, logging_config)
+    move_log.configure(tasks, logging_config['summary_every'])
+    from watchdog.observers import Observer
+    daemon_loop = loop = asyncio.get_running_loop()
     observer = Observer()
+    queue_config = dict(QUEUE_DEFAULTS, **(config.get('queue') or {}))
+    event_queue = EventQueue(queue_config['max_size'])
+    handler = ChangeHandler(tasks, event_queue, queue_config['block_timeout'])
+    stability_config = dict(STABILITY_DEFAULTS, **(config.get('stability') or {}))
+    handler.gate = gate = StabilityGate(handler.enqueue, stability_config['quiet'], stability_config['close_timeout'],
+                                        forget=handler.forget, close_events=type(observer).__name__ == 'InotifyObserver')
+    metrics.register('files_settling', 'gauge', lambda: len(gate))
+    metrics.register('queue_depth', 'gauge', lambda: len(event_queue))
+    metrics.register('queue_overflows_total', 'counter', lambda: event_queue.overflow_count)
+    metrics.register('events_coalesced_total', 'counter', lambda: event_queue.coalesced_count)
+    # Workers report their metrics to the supervisor, which serves them.
+    metrics_server = start_metrics_exporter(dict(METRICS_DEFAULTS, **(config.get('metrics') or {}))) if shard is None else None
+    mover_config = dict(MOVER_DEFAULTS, **(config.get('movers') or {}))
+    move_executor = MoveExecutor(mover_config['workers'], mover_config['per_device'])
+    journal = Journal(get_journal_path(PID_FILE))
+    if shard is None:
+        # The supervisor of a worker group has already resumed interrupted moves.
+        journal.recover()
     
-    for task in tasks:
-        if task['type'] == 'file-organization':
-            observer.schedule(ChangeHandler(tasks), os.path.abspath(task['source']), recursive=True)
+    watch_manager = WatchManager(observer, handler, config.get('watches'))
+    watch_manager.sync()
+    metrics.register('inotify_watches', 'gauge', lambda: watch_manager.watch_count)
+    # Watch the config file's directory so edits are picked up without a restart.
+    watch_manager.schedule(ConfigFileHandler(config_path, gate.close_events), os.path.dirname(os.path.abspath(config_path)))
     
-    # Start backup scheduling in a separate thread if 'backup' is defined in the config
-    if 'backup' in config:
-        backup_thread = Thread(target=backup_task, args=(config,))
-        backup_thread.start()
-
-    # Register the signal handler for SIGINT
-    signal.signal(signal.SIGINT, signal_handler)
+    # Schedule backups on the event loop if 'backup' is defined in the config
+    if config.get('backup') and runs_backups():
+        backup_scheduler = BackupScheduler(config['backup'], config.get('scheduler'), journal)
+        backup_scheduler.start(loop)
 
+    stop = asyncio.Event()
+    install_signal_handlers(loop, stop)
+    organizer = asyncio.create_task(organize_events(handler, event_queue, queue_config['max_batch'], queue_config['debounce']))
+    stability = asyncio.create_task(check_stability(gate, stability_config['interval']))
+    summaries = asyncio.create_task(report_move_summaries())
+    reporter = asyncio.create_task(report_metrics(shard.stats_queue, shard.index)) if shard is not None else None
     observer.start()
 
-    with open(PID_FILE, 'w') as f:
-        f.write(str(os.getpid()))
+    # A worker's PID is written by its supervisor, which it stops with.
+    supervisor = os.getppid()
+    if shard is None:
+        write_pid_file(PID_FILE, [os.getpid()])
 
-    # This loop keeps the script running until the observer is stopped
+    # Events only carry the changed path, so catch up on anything that
+    # landed in the sources while the daemon was not running.
+    event_queue.request_reconcile(skip_unchanged=True)
+
+    # This loop keeps the daemon running until it is stopped or the observer dies
+    reloading = None
     try:
-        while observer.is_alive():
-            observer.join(1)
+        while not stop.is_set() and observer.is_alive():
+            try:
+                await asyncio.wait_for(stop.wait(), 1)
+            except asyncio.TimeoutError:
+                pass
+            if reconcile_event.is_set():
+                reconcile_event.clear()
+                event_queue.request_reconcile()
+            # A reload runs in the background so stop and the supervisor are still checked;
+            # a reload requested meanwhile starts once it finished.
+            if reload_event.is_set() and (reloading is None or reloading.done()):
+                reload_event.clear()
+                reloading = loop.run_in_executor(None, reload_config, config_path, handler, watch_manager)
+            if shard is not None and os.getppid() != supervisor:
+                logging.error(f"Worker {shard.index} lost its supervisor, stopping")
+                break
     finally:
-        if observer.is_alive():
-            observer.stop()
-            observer.join()
+        shutdown_event.set()
+        if reloading is not None:
+            # Let a reload in progress finish changing watches before they are stopped.
+            await asyncio.wait([reloading])
+        observer.stop()
+        watch_manager.stop()
+        if backup_scheduler is not None:
+            backup_scheduler.stop()
+            await backup_scheduler.join()
+            backup_scheduler = None
+        # The batch in progress finishes; pending paths are left to the next startup scan.
+        stability.cancel()
+        summaries.cancel()
+        event_queue.close()
+        await organizer
+        # Let in-flight moves finish before the process exits.
+        move_executor.shutdown()
+        # Snapshots are only trustworthy if every event has been handled.
+        if not len(event_queue) and not event_queue.reconcile_requested and not event_queue.rescans and not len(gate):
+            for task in handler.tasks:
+                if task['type'] == 'file-organization':
+                    try:
+                        journal.save_snapshot(get_rule_index(task))
+                    except OSError as e:
+                        logging.error(f"Failed to snapshot {task['source']}: {e}")
+        journal.close()
+        journal = None
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        move_log.flush()
+        logging.info(f"Events received: {handler.events_received}, dropped as self-inflicted: {handler.events_dropped}")
+        observer.join()
+        daemon_loop = None
+        if reporter is not None:
+            reporter.cancel()
+            shard.stats_queue.put((shard.index,) + metrics.snapshot())
+        if shard is None and os.path.exists(PID_FILE):
+            os.remove(PID_FILE)
+        if log_listener is not None:
+            log_listener.stop()
 
 def stop_daemon():
     try:
-        with open(PID_FILE, 'r') as f:
-            pid = int(f.read())
+        pid, *workers = read_pid_file(PID_FILE)
         os.kill(pid, signal.SIGTERM)
     except FileNotFoundError:
         print("Error: PID file not found. Is the daemon running?")
         logging.error("Error: PID file not found. Is the daemon running?")
         sys.exit(1)
     except ProcessLookupError:
-        print("Error: Process not found. It may have been stopped already.")
-        logging.error("Error: Process not found. It may have been stopped already.")
-        sys.exit(1)
+        # The supervisor stops its own workers; only left-over workers of one that died are stopped here.
+        stopped = 0
+        for worker in workers:
+            try:
+                os.kill(worker, signal.SIGTERM)
+                stopped += 1
+            except ProcessLookupError:
+                pass
+        if not stopped:
+            print("Error: Process not found. It may have been stopped already.")
+            logging.error("Error: Process not found. It may have been stopped already.")
+            sys.exit(1)
+        print(f"Supervisor not found. Stopped {stopped} remaining workers.")
+        logging.warning(f"Supervisor not found. Stopped {stopped} remaining workers.")
 
 def main():
     parser = argparse.ArgumentParser(description='dirconfig Daemon')
@@ -234,8 +2774,14 @@ def main():
     parser.add_argument('--config', help='Path to the configuration file', default='config.yaml')
     parser.add_argument('--log', help='Path to the log file', default='dirconfig.log')
     parser.add_argument('--pid', help='Path to the PID file', default='dirconfig.pid')
+    parser.add_argument('--workers', help='Number of processes to shard the sources across', type=int, default=1)
     args = parser.parse_args()
 
+    # The journal lives next to the PID file, so honor --pid everywhere.
+    global PID_FILE, LOG_FILE
+    PID_FILE = args.pid
+    LOG_FILE = args.log
+
     # Resolve the absolute path of the configuration file
     config_path = os.path.abspath(args.config)
 
@@ -247,7 +2793,7 @@ def main():
             print(f"Configuration file not found: {config_path}")
             logging.error(f"Configuration file not found: {config_path}")
             sys.exit(1)
-        start_daemon(config_path)
+        start_daemon(config_path, args.workers)
     elif args.action == 'stop':
         stop_daemon()
     elif args.action == 'generate':
@@ -0,0 +1,9 @@
+import pytest
+
+@pytest.fixture
+def make_task():
+    """Return a factory for file-organization tasks with a single rule."""
+    def make_task(source, extension='.txt', destination='organized', **options):
+        return dict({'type': 'file-organization', 'source': str(source),
+                     'rules': [{'extension': extension, 'destination': destination}]}, **options)
+    return make_task
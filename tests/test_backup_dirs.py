@@ -0,0 +1,98 @@
+from dirconfig import Journal, setup_backup_dirs, parse_backup_dirs, urbackup_client_running, urbackup_status_cache
+from unittest.mock import patch
+import pytest
+import json
+import os
+
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stubs')
+
+pytestmark = pytest.mark.skipif(os.name == 'nt', reason="the urbackupclientctl stub is a POSIX script")
+
+@pytest.fixture
+def urbackup_stub(tmp_path, monkeypatch):
+    """
+    Puts the urbackupclientctl stub first on PATH and returns a helper to read
+    and seed its state.
+    """
+    state_path = tmp_path / 'urbackup_state.json'
+    monkeypatch.setenv('PATH', STUBS_DIR + os.pathsep + os.environ['PATH'])
+    monkeypatch.setenv('URBACKUP_STUB_STATE', str(state_path))
+    urbackup_status_cache.clear()
+
+    class Stub:
+        def seed(self, dirs, running=True):
+            state_path.write_text(json.dumps({'dirs': dirs, 'calls': [], 'running': running}))
+
+        @property
+        def state(self):
+            return json.loads(state_path.read_text())
+
+    yield Stub()
+    urbackup_status_cache.clear()
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / 'dirconfig.journal'))
+    with patch('dirconfig.journal', journal):
+        yield journal
+    journal.close()
+
+def test_parse_backup_dirs():
+    table = "PATH                 NAME       FLAGS\n/home/user/My Files  files      default\n/srv/data  data  default\n"
+    assert parse_backup_dirs(table) == ['/home/user/My Files', '/srv/data']
+    assert parse_backup_dirs('[{"path": "/a"}, {"path": "/b"}]') == ['/a', '/b']
+    assert parse_backup_dirs('No backup directories') == []
+
+def test_setup_backup_dirs_applies_only_the_delta(urbackup_stub, journal):
+    """
+    Tests that the registered directories are listed once and only missing
+    directories are added and the ones this entry added before are removed.
+    """
+    urbackup_stub.seed(['/keep', '/manual'])
+    setup_backup_dirs({'name': 'files', 'directories': ['/keep', '/stale']})
+    setup_backup_dirs({'name': 'files', 'directories': ['/keep', '/new1', '/new2']})
+
+    state = urbackup_stub.state
+    # '/manual' was never part of the config and '/keep' was there before dirconfig.
+    assert sorted(state['dirs']) == ['/keep', '/manual', '/new1', '/new2']
+    commands = sorted(call[0] for call in state['calls'][2:])
+    assert commands == ['add-backupdir', 'add-backupdir', 'list-backupdirs', 'remove-backupdir']
+
+    setup_backup_dirs({'name': 'files', 'directories': []})
+    assert sorted(urbackup_stub.state['dirs']) == ['/keep', '/manual']
+
+def test_backup_entries_keep_each_others_dirs(urbackup_stub, journal):
+    urbackup_stub.seed([])
+    for _ in range(2):
+        setup_backup_dirs({'name': 'A', 'directories': ['/a', '/shared']})
+        setup_backup_dirs({'name': 'B', 'directories': ['/b', '/shared']})
+    assert sorted(urbackup_stub.state['dirs']) == ['/a', '/b', '/shared']
+
+    # A shared directory is removed once no entry lists it anymore.
+    setup_backup_dirs({'name': 'A', 'directories': ['/a']})
+    assert sorted(urbackup_stub.state['dirs']) == ['/a', '/b', '/shared']
+    setup_backup_dirs({'name': 'B', 'directories': ['/b']})
+    assert sorted(urbackup_stub.state['dirs']) == ['/a', '/b']
+
+def test_setup_backup_dirs_is_a_no_op_when_up_to_date(urbackup_stub):
+    urbackup_stub.seed(['/a', '/b'])
+    setup_backup_dirs({'directories': ['/b', '/a/']})
+    assert urbackup_stub.state['calls'] == [['list-backupdirs']]
+
+def test_setup_backup_dirs_without_prune_keeps_extra_dirs(urbackup_stub, journal):
+    urbackup_stub.seed([])
+    setup_backup_dirs({'directories': ['/a']})
+    setup_backup_dirs({'directories': ['/b'], 'prune': False})
+    assert sorted(urbackup_stub.state['dirs']) == ['/a', '/b']
+
+def test_client_status_is_cached(urbackup_stub):
+    urbackup_stub.seed([])
+    assert urbackup_client_running()
+    assert urbackup_client_running()
+    assert urbackup_stub.state['calls'] == [['status']]
+
+def test_failed_client_status_is_not_cached(urbackup_stub):
+    urbackup_stub.seed([], running=False)
+    assert not urbackup_client_running()
+    assert not urbackup_client_running()
+    assert urbackup_stub.state['calls'] == [['status'], ['status']]
@@ -0,0 +1,81 @@
+from dirconfig import BackupScheduler, Journal, next_backup_run, get_backup_interval, set_backup_retention, get_urbackup_command
+from unittest.mock import patch, MagicMock
+from threading import Event
+import asyncio
+import pytest
+import time
+
+DAY = 86400.0
+
+def make_entry(name='client', schedule='daily', **extra):
+    return dict({'name': name, 'type': 'incremental-file', 'schedule': schedule, 'directories': []}, **extra)
+
+def test_get_backup_interval():
+    assert get_backup_interval('daily') == DAY
+    assert get_backup_interval('weekly') == 7 * DAY
+    assert get_backup_interval(120) == 120
+    with pytest.raises(ValueError):
+        get_backup_interval('fortnightly')
+
+def test_next_backup_run():
+    now = 10 * DAY
+    # Not yet due: unchanged.
+    assert next_backup_run(now + 5, DAY, now) == now + 5
+    # Missed three runs: catch up once, right away.
+    assert next_backup_run(now - 2.5 * DAY, DAY, now, catch_up=True) == now
+    # Missed three runs without catch-up: next slot on the original cadence.
+    assert next_backup_run(now - 2.5 * DAY, DAY, now, catch_up=False) == now + 0.5 * DAY
+
+@patch('dirconfig.subprocess.run')
+def test_set_backup_retention(mock_run):
+    mock_run.return_value = MagicMock(stdout="", stderr="", returncode=0)
+    set_backup_retention(make_entry(schedule='daily', retention=7))
+    mock_run.assert_called_with([get_urbackup_command(), "set-settings", "-k", "max_file_incr", "-v", "7"], capture_output=True, text=True)
+
+    set_backup_retention(make_entry(schedule='weekly', retention=30, type='full-image'))
+    mock_run.assert_called_with([get_urbackup_command(), "set-settings", "-k", "max_image_full", "-v", "5"], capture_output=True, text=True)
+
+def test_scheduler_restores_persisted_runs(tmp_path):
+    """
+    Tests that persisted next-run times are honored and that missed runs are
+    skipped when catch-up is disabled.
+    """
+    journal = Journal(str(tmp_path / 'dirconfig.journal'))
+    now = time.time()
+    journal.save_backup_run('later', now + 3600)
+    journal.save_backup_run('missed', now - 1.5 * DAY)
+
+    scheduler = BackupScheduler([make_entry('later'), make_entry('missed'), make_entry('new')], {'catch_up': False}, journal)
+    due = {entry['name']: run for run, _, entry in scheduler.heap}
+
+    assert due['later'] == pytest.approx(now + 3600)
+    assert due['missed'] == pytest.approx(now + 0.5 * DAY, abs=5)
+    assert due['new'] == pytest.approx(now, abs=5)
+    journal.close()
+
+def test_scheduler_runs_due_backups_and_stops_promptly(tmp_path):
+    journal = Journal(str(tmp_path / 'dirconfig.journal'))
+    ran = Event()
+
+    async def run(scheduler):
+        scheduler.start(asyncio.get_running_loop())
+        assert await asyncio.get_running_loop().run_in_executor(None, ran.wait, 5)
+        started = time.monotonic()
+        scheduler.stop()
+        await asyncio.wait_for(scheduler.join(), 5)
+        return time.monotonic() - started
+
+    with patch('dirconfig.backup_task', side_effect=lambda entry: ran.set()) as mock_backup_task:
+        scheduler = BackupScheduler([make_entry()], None, journal)
+        assert asyncio.run(run(scheduler)) < 1
+
+    mock_backup_task.assert_called_once()
+    assert journal.load_backup_schedule()['client'] == pytest.approx(time.time() + DAY, abs=5)
+    journal.close()
+
+def test_scheduler_skips_overlapping_runs():
+    scheduler = BackupScheduler([], {'max_concurrent': 1})
+    scheduler.pool = MagicMock()
+    scheduler.running.add('client')
+    scheduler._dispatch(make_entry())
+    scheduler.pool.submit.assert_not_called()
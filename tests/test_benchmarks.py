@@ -0,0 +1,23 @@
+import subprocess
+import json
+import sys
+import os
+
+BENCH_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'bench.py')
+
+def test_benchmark_suite_emits_json(tmp_path):
+    """
+    Smoke test for the benchmark suite: a tiny organize run must produce a
+    JSON report with throughput and peak RSS.
+    """
+    output = tmp_path / 'results.json'
+    subprocess.run([sys.executable, BENCH_SCRIPT, '--files', '50', '--extensions', '4', '--rules', '2',
+                    '--depth', '1', '--scenario', 'organize_same_device', '--output', str(output)],
+                   check=True, capture_output=True)
+
+    report = json.loads(output.read_text())
+    result = report['results']['organize_same_device']
+    assert report['params']['files'] == 50
+    assert result['moved'] == 50
+    assert result['files_per_second'] > 0
+    assert result['peak_rss_bytes'] > 0
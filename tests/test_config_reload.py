@@ -0,0 +1,163 @@
+from dirconfig import ChangeHandler, ConfigFileHandler, EventQueue, WatchManager, load_config, organize_batch, reload_config, reload_event
+from watchdog.events import FileClosedEvent, FileCreatedEvent, FileModifiedEvent, FileMovedEvent
+from unittest.mock import MagicMock, patch
+import tempfile
+import pytest
+import shutil
+import os
+
+CONFIG = """
+tasks:
+  - type: file-organization
+    source: "{source}"
+    rules:
+      - extension: .txt
+        destination: "text_files"
+"""
+
+EXTRA_RULE = """      - extension: .jpg
+        destination: "images"
+"""
+
+OTHER_TASK = """  - type: file-organization
+    source: "{other}"
+    rules:
+      - extension: .pdf
+        destination: "documents"
+"""
+
+CHANGED_CONFIG = CONFIG + EXTRA_RULE + OTHER_TASK
+
+@pytest.fixture
+def env():
+    root = tempfile.mkdtemp()
+    source = os.path.join(root, 'source')
+    other = os.path.join(root, 'other')
+    os.mkdir(source)
+    os.mkdir(other)
+    config_path = os.path.join(root, 'config.yaml')
+    with open(config_path, 'w') as f:
+        f.write(CONFIG.format(source=source))
+    yield root, source, other, config_path
+    shutil.rmtree(root)
+
+def test_set_tasks_swaps_routes(env):
+    root, source, other, config_path = env
+    handler = ChangeHandler(load_config(config_path)['tasks'])
+    assert not handler.owners(os.path.join(other, 'a.pdf'))
+
+    with open(config_path, 'w') as f:
+        f.write(CHANGED_CONFIG.format(source=source, other=other))
+    handler.set_tasks(load_config(config_path)['tasks'])
+    assert handler.owners(os.path.join(other, 'a.pdf')) == [handler.tasks[1]]
+    assert len(handler.tasks) == 2
+
+def test_reload_applies_only_changed_tasks(env):
+    root, source, other, config_path = env
+    queue = EventQueue()
+    handler = ChangeHandler(load_config(config_path)['tasks'], queue)
+    observer = MagicMock()
+    watch_manager = WatchManager(observer, handler)
+    watch_manager.sync()
+    assert set(watch_manager.watches) == {(source, 'flat')}
+
+    for name in ('notes.txt', 'photo.jpg'):
+        open(os.path.join(source, name), 'w').close()
+    open(os.path.join(other, 'paper.pdf'), 'w').close()
+    with open(config_path, 'w') as f:
+        f.write(CHANGED_CONFIG.format(source=source, other=other))
+
+    with patch('dirconfig.organize_files') as organize:
+        config = reload_config(config_path, handler, watch_manager)
+        # The rescans are queued rather than run by the reload.
+        organize.assert_not_called()
+        organize_batch(handler, *queue.take_batch())
+    assert config is not None
+    # The first task gained a rule and the second is new, so both are organized.
+    assert [call.args[0]['source'] for call in organize.call_args_list] == [source, other]
+    assert queue.take_batch() == ([], False)
+    assert set(watch_manager.watches) == {(source, 'flat'), (other, 'flat')}
+    observer.schedule.assert_called_with(handler, other, recursive=False)
+    observer.unschedule.assert_not_called()
+
+    # Dropping the second task again removes its watch without a rescan.
+    with open(config_path, 'w') as f:
+        f.write((CONFIG + EXTRA_RULE).format(source=source))
+    reload_config(config_path, handler, watch_manager)
+    assert queue.take_batch() == ([], False)
+    assert set(watch_manager.watches) == {(source, 'flat')}
+    observer.unschedule.assert_called_once()
+
+def test_reload_keeps_config_on_error(env):
+    root, source, other, config_path = env
+    handler = ChangeHandler(load_config(config_path)['tasks'])
+    tasks = handler.tasks
+    with open(config_path, 'w') as f:
+        f.write("tasks: [unbalanced")
+    assert reload_config(config_path, handler, WatchManager(MagicMock(), handler)) is None
+    assert handler.tasks is tasks
+
+def test_reload_keeps_config_when_emptied(env):
+    root, source, other, config_path = env
+    handler = ChangeHandler(load_config(config_path)['tasks'])
+    tasks = handler.tasks
+    open(config_path, 'w').close()
+    assert reload_config(config_path, handler, WatchManager(MagicMock(), handler)) is None
+    assert handler.tasks is tasks
+
+def test_reload_keeps_config_when_a_watch_fails(env):
+    root, source, other, config_path = env
+    handler = ChangeHandler(load_config(config_path)['tasks'])
+    tasks = handler.tasks
+    observer = MagicMock()
+    watch_manager = WatchManager(observer, handler)
+    watch_manager.sync()
+    missing = os.path.join(root, 'zzz-missing')
+
+    def schedule(handler, path, recursive):
+        if path == missing:
+            raise FileNotFoundError(path)
+        return path
+
+    observer.schedule.side_effect = schedule
+    with open(config_path, 'w') as f:
+        f.write((CONFIG + OTHER_TASK + OTHER_TASK.replace('{other}', '{missing}')).format(
+            source=source, other=other, missing=missing))
+    with patch('dirconfig.organize_files') as organize:
+        assert reload_config(config_path, handler, watch_manager) is None
+    organize.assert_not_called()
+    assert handler.tasks is tasks
+    # The watch added for the other source before the failure is removed again.
+    assert set(watch_manager.watches) == {(source, 'flat')}
+    observer.unschedule.assert_called_once_with(other)
+
+def test_config_file_handler(env):
+    root, source, other, config_path = env
+    handler = ConfigFileHandler(config_path)
+    reload_event.clear()
+    handler.dispatch(FileCreatedEvent(os.path.join(root, 'unrelated.yaml')))
+    assert not reload_event.is_set()
+    handler.dispatch(FileModifiedEvent(config_path))
+    assert reload_event.is_set()
+    reload_event.clear()
+    handler.dispatch(FileMovedEvent(os.path.join(root, '.config.yaml.swp'), config_path))
+    assert reload_event.is_set()
+    reload_event.clear()
+
+def test_config_file_handler_waits_for_close(env):
+    """
+    Tests that with close events, a config written in place is reloaded once
+    it is closed, not on each write.
+    """
+    root, source, other, config_path = env
+    handler = ConfigFileHandler(config_path, close_events=True)
+    reload_event.clear()
+    handler.dispatch(FileCreatedEvent(config_path))
+    handler.dispatch(FileModifiedEvent(config_path))
+    assert not reload_event.is_set()
+    handler.dispatch(FileClosedEvent(config_path))
+    assert reload_event.is_set()
+    reload_event.clear()
+    handler.dispatch(FileMovedEvent(os.path.join(root, '.config.yaml.swp'), config_path))
+    assert reload_event.is_set()
+    reload_event.clear()
@@ -0,0 +1,86 @@
+from dirconfig import DedupIndex, Journal, hash_file, organize_files
+from unittest.mock import patch
+import dirconfig
+import pytest
+import os
+
+@pytest.fixture
+def source(tmp_path):
+    documents = tmp_path / 'documents'
+    documents.mkdir()
+    (documents / 'report.pdf').write_bytes(b'report')
+    (tmp_path / 'report(1).pdf').write_bytes(b'report')
+    (tmp_path / 'other.pdf').write_bytes(b'others')
+    return tmp_path
+
+def test_hash_file_partial(tmp_path):
+    (tmp_path / 'a').write_bytes(b'x' * 10 + b'a')
+    (tmp_path / 'b').write_bytes(b'x' * 10 + b'b')
+    assert hash_file(str(tmp_path / 'a'), 10) == hash_file(str(tmp_path / 'b'), 10)
+    assert hash_file(str(tmp_path / 'a')) != hash_file(str(tmp_path / 'b'))
+
+def test_destination_is_only_hashed_on_size_collisions(source):
+    index = DedupIndex()
+    (source / 'unique.pdf').write_bytes(b'a different size')
+    with patch('dirconfig.hash_file', wraps=hash_file) as hashed:
+        assert index.find_duplicate(str(source / 'unique.pdf'), str(source / 'documents')) is None
+        hashed.assert_not_called()
+        assert index.find_duplicate(str(source / 'report(1).pdf'), str(source / 'documents')) == str(source / 'documents' / 'report.pdf')
+        assert index.find_duplicate(str(source / 'other.pdf'), str(source / 'documents')) is None
+
+@patch('dirconfig.PARTIAL_HASH_SIZE', 4)
+def test_full_hash_decides_when_prefixes_match(source):
+    (source / 'documents' / 'long.bin').write_bytes(b'headAAAA')
+    (source / 'same-head.bin').write_bytes(b'headBBBB')
+    (source / 'same.bin').write_bytes(b'headAAAA')
+    index = DedupIndex()
+    assert index.find_duplicate(str(source / 'same-head.bin'), str(source / 'documents')) is None
+    assert index.find_duplicate(str(source / 'same.bin'), str(source / 'documents')) == str(source / 'documents' / 'long.bin')
+
+def test_hashes_are_persisted(source, tmp_path_factory):
+    journal = Journal(str(tmp_path_factory.mktemp('journal') / 'dirconfig.journal'))
+    DedupIndex(journal).find_duplicate(str(source / 'report(1).pdf'), str(source / 'documents'))
+    with patch('dirconfig.hash_file', wraps=hash_file) as hashed:
+        DedupIndex(journal).find_duplicate(str(source / 'report(1).pdf'), str(source / 'documents'))
+    # Only the incoming file is hashed again; the destination's hash comes from the journal.
+    assert [call.args[0] for call in hashed.call_args_list] == [str(source / 'report(1).pdf')]
+
+    # A changed file loses its stored hash.
+    (source / 'documents' / 'report.pdf').write_bytes(b'REPORT')
+    assert DedupIndex(journal).find_duplicate(str(source / 'report(1).pdf'), str(source / 'documents')) is None
+    journal.close()
+
+@pytest.mark.parametrize('mode', ['drop', 'hardlink', 'rename'])
+def test_organize_files_handles_duplicates(mode, source, make_task):
+    dirconfig.dedup_index = None
+    assert organize_files(make_task(source, '.pdf', 'documents', dedup=mode)) == 2
+    documents = source / 'documents'
+    assert not (source / 'report(1).pdf').exists()
+    assert (documents / 'other.pdf').exists()
+    if mode == 'drop':
+        assert sorted(os.listdir(documents)) == ['other.pdf', 'report.pdf']
+    elif mode == 'hardlink':
+        assert os.path.samefile(documents / 'report.pdf', documents / 'report(1).pdf')
+    else:
+        assert (documents / 'report(1) (duplicate).pdf').read_bytes() == b'report'
+
+def test_moves_keep_the_destination_listing_current(source, make_task):
+    dirconfig.dedup_index = None
+    task = make_task(source, '.pdf', 'documents', dedup='drop')
+    assert organize_files(task) == 2
+    (source / 'again.pdf').write_bytes(b'others')
+    with patch('dirconfig.os.scandir', wraps=os.scandir) as scandir:
+        assert organize_files(task) == 1
+    # The move of other.pdf updated the cached listing, so only the source is listed.
+    assert [call.args[0] for call in scandir.call_args_list] == [str(source)]
+    assert not (source / 'again.pdf').exists()
+
+    # A file that appears by other means is picked up by listing the destination again.
+    (source / 'documents' / 'manual.pdf').write_bytes(b'manual')
+    (source / 'manual copy.pdf').write_bytes(b'manual')
+    assert organize_files(task) == 1
+    assert not (source / 'documents' / 'manual copy.pdf').exists()
+
+def test_invalid_dedup_mode(source, make_task):
+    with pytest.raises(ValueError):
+        dirconfig.compile_rules(make_task(source, '.pdf', 'documents', dedup='delete'))
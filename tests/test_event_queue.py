@@ -0,0 +1,174 @@
+from dirconfig import EventQueue, ChangeHandler, MoveRegistry, RECONCILE_FULL, move_registry, organize_events, rules_version, shutdown_event
+from watchdog.events import FileCreatedEvent, FileModifiedEvent, FileMovedEvent
+from unittest.mock import MagicMock
+import asyncio
+import time
+import os
+
+def test_event_queue_coalesces_duplicate_paths():
+    """
+    Tests that repeated events for the same path collapse into a single entry.
+    """
+    queue = EventQueue(max_size=10)
+    for _ in range(5):
+        queue.put('/source/a.txt')
+    queue.put('/source/b.txt')
+
+    batch, reconcile = queue.take_batch(max_batch=10)
+    assert batch == ['/source/a.txt', '/source/b.txt']
+    assert not reconcile
+    assert queue.coalesced_count == 4
+
+def test_event_queue_respects_max_batch():
+    queue = EventQueue(max_size=10)
+    for i in range(5):
+        queue.put(f'/source/{i}.txt')
+
+    batch, _ = queue.take_batch(max_batch=3)
+    assert len(batch) == 3
+    assert len(queue) == 2
+
+def test_event_queue_overflow_falls_back_to_reconcile():
+    """
+    Tests that a full queue drops new paths, counts the overflow and asks the
+    worker for a single reconciliation scan.
+    """
+    queue = EventQueue(max_size=2)
+    assert queue.put('/source/a.txt')
+    assert queue.put('/source/b.txt')
+    assert not queue.put('/source/c.txt')
+    assert not queue.put('/source/d.txt')
+    assert queue.overflow_count == 2
+
+    batch, reconcile = queue.take_batch(max_batch=10)
+    assert batch == []
+    assert reconcile
+    assert len(queue) == 0
+
+def test_event_queue_take_batch_does_not_wait():
+    queue = EventQueue()
+    assert queue.take_batch() == ([], False)
+
+def test_change_handler_enqueues_instead_of_organizing(tmp_path):
+    """
+    Tests that with a queue attached the handler only enqueues owned paths and
+    leaves the organizing to the worker.
+    """
+    tasks = [{'type': 'file-organization', 'source': str(tmp_path), 'rules': [{'extension': '.txt', 'destination': 'text_files'}]}]
+    queue = EventQueue()
+    handler = ChangeHandler(tasks, queue)
+    (tmp_path / 'a.txt').write_text('a')
+
+    handler.dispatch(FileCreatedEvent(str(tmp_path / 'a.txt')))
+    handler.dispatch(FileModifiedEvent(str(tmp_path / 'a.txt')))
+    handler.dispatch(FileCreatedEvent(os.path.join(str(tmp_path), 'elsewhere', 'b.txt')))
+
+    assert list(queue.pending) == [str(tmp_path / 'a.txt')]
+    assert (tmp_path / 'a.txt').exists()
+
+def test_organize_events_processes_batches():
+    queue = EventQueue()
+    handler = MagicMock()
+    processed = []
+    def organize_paths(paths):
+        processed.extend(paths)
+        queue.close()
+    handler.organize_paths.side_effect = organize_paths
+    queue.put('/source/a.txt')
+    queue.put('/source/b.txt')
+
+    asyncio.run(asyncio.wait_for(organize_events(handler, queue, max_batch=10, debounce=0), 5))
+
+    assert processed == ['/source/a.txt', '/source/b.txt']
+    handler.reconcile.assert_not_called()
+    assert queue.notify is None
+
+def test_organize_events_runs_reconcile_when_requested():
+    queue = EventQueue()
+    handler = MagicMock()
+    handler.reconcile.side_effect = lambda **kwargs: queue.close()
+    queue.put('/source/a.txt')
+    queue.request_reconcile()
+
+    asyncio.run(asyncio.wait_for(organize_events(handler, queue, max_batch=10, debounce=0), 5))
+
+    handler.reconcile.assert_called_once()
+    handler.organize_paths.assert_not_called()
+
+def test_event_queue_rescans_single_tasks():
+    """
+    Tests that scans of single tasks keep the paths queued for other sources,
+    and that a full scan covers them.
+    """
+    queue = EventQueue()
+    queue.put('/source/a.txt')
+    queue.request_reconcile(versions=[('/other', 'abc')])
+    assert queue.take_batch() == ([], (('/other', 'abc'),))
+    assert queue.take_batch() == (['/source/a.txt'], False)
+
+    queue.request_reconcile(versions=[('/other', 'abc')])
+    queue.request_reconcile()
+    assert queue.take_batch() == ([], RECONCILE_FULL)
+    assert queue.take_batch() == ([], False)
+
+def test_interrupted_scan_is_requested_again(tmp_path):
+    """
+    Tests that a scan stops between chunks on shutdown and is left in the queue,
+    so the sources are not snapshotted as organized.
+    """
+    (tmp_path / 'a.txt').write_text('a')
+    task = {'type': 'file-organization', 'source': str(tmp_path), 'rules': [{'extension': '.txt', 'destination': 'text_files'}]}
+    queue = EventQueue()
+    handler = ChangeHandler([task], queue)
+    shutdown_event.set()
+    try:
+        handler.reconcile(versions=(rules_version(task),))
+    finally:
+        shutdown_event.clear()
+    assert (tmp_path / 'a.txt').exists()
+    assert queue.take_batch() == ([], (rules_version(task),))
+
+def test_organize_events_wakes_up_for_paths_from_other_threads():
+    """
+    Tests that paths put by another thread (like the observer) wake the event
+    loop and that closing the queue ends the loop.
+    """
+    queue = EventQueue()
+    handler = MagicMock()
+    handler.organize_paths.side_effect = lambda paths: queue.close()
+
+    async def run():
+        organizer = asyncio.create_task(organize_events(handler, queue, max_batch=10, debounce=0.01))
+        await asyncio.sleep(0.05)
+        await asyncio.get_running_loop().run_in_executor(None, queue.put, '/source/a.txt')
+        await asyncio.wait_for(organizer, 5)
+
+    asyncio.run(run())
+    handler.organize_paths.assert_called_once_with(['/source/a.txt'])
+
+def test_change_handler_drops_self_inflicted_events(tmp_path):
+    """
+    Tests that events below destinations inside the source and events for files
+    dirconfig just moved are dropped before reaching the queue.
+    """
+    tasks = [{'type': 'file-organization', 'source': str(tmp_path), 'rules': [{'extension': '.txt', 'destination': 'text_files'}]}]
+    queue = EventQueue()
+    handler = ChangeHandler(tasks, queue)
+    (tmp_path / 'a.txt').write_text('a')
+
+    handler.organize_path(str(tmp_path / 'a.txt'))
+    moved = str(tmp_path / 'text_files' / 'a.txt')
+    handler.dispatch(FileMovedEvent(str(tmp_path / 'a.txt'), moved))
+    handler.dispatch(FileCreatedEvent(moved))
+    assert moved in move_registry
+
+    assert handler.events_received == 2
+    assert handler.events_dropped == 2
+    assert len(queue) == 0
+
+def test_move_registry_entries_expire():
+    registry = MoveRegistry(ttl=0.01)
+    registry.register('/dest/a.txt')
+    assert '/dest/a.txt' in registry
+    time.sleep(0.02)
+    assert '/dest/a.txt' not in registry
@@ -0,0 +1,79 @@
+from dirconfig import Journal, RuleIndex, ChangeHandler, get_journal_path
+from unittest.mock import patch
+import os
+
+RULES = [{'extension': '.txt', 'destination': 'text_files'}]
+
+def test_get_journal_path():
+    assert get_journal_path('/run/dirconfig.pid') == '/run/dirconfig.journal'
+
+def test_journal_tracks_pending_moves(tmp_path):
+    journal = Journal(str(tmp_path / 'dirconfig.journal'))
+    journal.begin_moves([('/src/a.txt', '/dest/a.txt'), ('/src/b.txt', '/dest/b.txt')])
+    journal.finish_moves(['/src/a.txt'])
+
+    assert journal.pending_moves() == [('/src/b.txt', '/dest/b.txt')]
+    journal.close()
+
+def test_journal_recover_resumes_interrupted_moves(tmp_path):
+    """
+    Tests that moves left pending by a crash are redone when the source still
+    exists, and settled when the move already completed.
+    """
+    source = tmp_path / 'source'
+    dest = tmp_path / 'dest'
+    source.mkdir()
+    dest.mkdir()
+    (source / 'interrupted.txt').write_text('interrupted')
+    (dest / 'interrupted.txt.dirconfig-tmp').write_text('partial')
+    (dest / 'completed.txt').write_text('completed')
+    journal = Journal(str(tmp_path / 'dirconfig.journal'))
+    journal.begin_moves([
+        (str(source / 'interrupted.txt'), str(dest / 'interrupted.txt')),
+        (str(source / 'completed.txt'), str(dest / 'completed.txt')),
+    ])
+
+    with patch('dirconfig.journal', journal):
+        assert journal.recover() == 1
+
+    assert (dest / 'interrupted.txt').read_text() == 'interrupted'
+    assert not (dest / 'interrupted.txt.dirconfig-tmp').exists()
+    assert journal.pending_moves() == []
+    journal.close()
+
+def test_journal_snapshots_detect_changes(tmp_path):
+    """
+    Tests that a source is reported unchanged only while its directory and
+    rules match the saved snapshot.
+    """
+    journal = Journal(str(tmp_path / 'dirconfig.journal'))
+    source = tmp_path / 'source'
+    source.mkdir()
+    index = RuleIndex(RULES, str(source))
+
+    assert not journal.is_unchanged(index)
+    journal.save_snapshot(index)
+    assert journal.is_unchanged(index)
+
+    assert not journal.is_unchanged(RuleIndex([{'extension': '.pdf', 'destination': 'documents'}], str(source)))
+    assert not journal.is_unchanged(RuleIndex(RULES, str(source), depth=1))
+
+    (source / 'new.txt').write_text('new')
+    os.utime(source, ns=(0, os.stat(source).st_mtime_ns + 1_000_000_000))
+    assert not journal.is_unchanged(index)
+    journal.close()
+
+def test_reconcile_skips_unchanged_sources(tmp_path):
+    source = tmp_path / 'source'
+    source.mkdir()
+    task = {'type': 'file-organization', 'source': str(source), 'rules': RULES}
+    handler = ChangeHandler([task])
+    journal = Journal(str(tmp_path / 'dirconfig.journal'))
+    journal.save_snapshot(handler.sources[str(source)][0]['rule_index'])
+
+    with patch('dirconfig.journal', journal), patch('dirconfig.organize_files') as mock_organize_files:
+        handler.reconcile(skip_unchanged=True)
+        mock_organize_files.assert_not_called()
+        handler.reconcile()
+        mock_organize_files.assert_called_once_with(task, None)
+    journal.close()
@@ -0,0 +1,82 @@
+from dirconfig import JsonFormatter, MoveLog, MoveResult, setup_logging, echo, report_move_summaries
+from unittest.mock import patch
+import dirconfig
+import asyncio
+import logging
+import pytest
+import json
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level, echo_enabled = root.handlers[:], root.level, dirconfig.ECHO
+    yield
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    dirconfig.ECHO = echo_enabled
+
+def moved(source, size=10):
+    return MoveResult(source, '/dest/' + source, True, size, None)
+
+def test_json_formatter_includes_fields():
+    record = logging.LogRecord('dirconfig', logging.INFO, __file__, 1, 'Moved: a.txt', None, None)
+    record.fields = {'event': 'move', 'bytes': 3}
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry['message'] == 'Moved: a.txt'
+    assert entry['level'] == 'INFO'
+    assert entry['event'] == 'move' and entry['bytes'] == 3
+
+def test_move_log_summarizes_per_task(caplog, capsys):
+    move_log = MoveLog()
+    move_log.configure([{'name': 'downloads', 'summary_every': 3}, {'name': 'scans'}])
+    with caplog.at_level(logging.INFO):
+        for i in range(7):
+            move_log.moved('downloads', moved(f'{i}.txt'))
+        move_log.moved('scans', moved('scan.pdf'))
+        move_log.flush()
+    messages = [record.getMessage() for record in caplog.records]
+    assert [message for message in messages if message.startswith('Moved 3 files (30 bytes) for downloads')]
+    assert len([message for message in messages if 'for downloads' in message]) == 3
+    assert 'Moved 1 files (10 bytes) for downloads' in messages[-1]
+    # Tasks without summary_every keep one line per move.
+    assert 'Moved: scan.pdf -> /dest/scan.pdf' in messages
+    assert capsys.readouterr().out.count('\n') == len(messages)
+
+def test_stale_summaries_are_logged_without_further_moves(caplog):
+    move_log = MoveLog()
+    move_log.configure([{'name': 'downloads', 'summary_every': 100}])
+
+    async def burst_then_quiet():
+        task = asyncio.create_task(report_move_summaries(0.01))
+        for i in range(3):
+            move_log.moved('downloads', moved(f'{i}.txt'))
+        await asyncio.sleep(0.1)
+        assert not caplog.records
+        with patch('dirconfig.SUMMARY_MAX_AGE', 0.05):
+            await asyncio.sleep(0.1)
+        task.cancel()
+
+    with patch('dirconfig.move_log', move_log), caplog.at_level(logging.INFO):
+        asyncio.run(burst_then_quiet())
+    assert [record.getMessage().split(' in ')[0] for record in caplog.records] == ['Moved 3 files (30 bytes) for downloads']
+    assert not move_log.summaries
+
+def test_print_can_be_turned_off(restore_logging, tmp_path, capsys):
+    listener = setup_logging(str(tmp_path / 'dirconfig.log'), {'print': False, 'format': 'json'})
+    echo("not printed")
+    logging.info("logged", extra={'fields': {'event': 'test'}})
+    listener.stop()
+    assert capsys.readouterr().out == ''
+    with open(tmp_path / 'dirconfig.log') as f:
+        entry = json.loads(f.readline())
+    assert entry['message'] == 'logged' and entry['event'] == 'test'
+
+def test_log_file_rotates(restore_logging, tmp_path):
+    listener = setup_logging(str(tmp_path / 'dirconfig.log'), {'max_bytes': 200, 'backups': 2})
+    for i in range(50):
+        logging.info(f"message {i}")
+    listener.stop()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['dirconfig.log', 'dirconfig.log.1', 'dirconfig.log.2']
@@ -0,0 +1,69 @@
+from dirconfig import Metrics, Histogram, metrics, organize_files, start_metrics_exporter, backup_task
+from unittest.mock import patch
+from urllib.request import urlopen
+import pytest
+
+def test_histogram_buckets():
+    histogram = Histogram(buckets=(0.1, 1.0, float('inf')))
+    for value in (0.05, 0.5, 0.7, 5):
+        histogram.observe(value)
+    assert histogram.counts == [1, 2, 1]
+    assert histogram.count == 4
+    assert histogram.sum == pytest.approx(6.25)
+
+def test_metrics_render_prometheus_text():
+    registry = Metrics()
+    registry.inc('files_moved_total', task='Downloads')
+    registry.inc('files_moved_total', 2, task='Downloads')
+    registry.register('queue_depth', 'gauge', lambda: 7)
+    registry.observe('move_seconds', 0.002, task='say "hi"')
+
+    text = registry.render()
+
+    assert '# TYPE dirconfig_files_moved_total counter' in text
+    assert 'dirconfig_files_moved_total{task="Downloads"} 3' in text
+    assert 'dirconfig_queue_depth 7' in text
+    assert '# TYPE dirconfig_move_seconds histogram' in text
+    assert 'dirconfig_move_seconds_bucket{task="say \\"hi\\"",le="0.001"} 0' in text
+    assert 'dirconfig_move_seconds_bucket{task="say \\"hi\\"",le="0.005"} 1' in text
+    assert 'dirconfig_move_seconds_bucket{task="say \\"hi\\"",le="+Inf"} 1' in text
+    assert 'dirconfig_move_seconds_count{task="say \\"hi\\""} 1' in text
+
+def test_organize_files_records_metrics(tmp_path):
+    """
+    Tests that a scan records files scanned, matched and moved, bytes moved
+    and move latency for the task.
+    """
+    metrics.reset()
+    (tmp_path / 'a.txt').write_text('hello')
+    (tmp_path / 'b.bin').write_text('ignored')
+    task = {'name': 'Docs', 'type': 'file-organization', 'source': str(tmp_path), 'rules': [{'extension': '.txt', 'destination': 'text_files'}]}
+
+    organize_files(task)
+
+    assert metrics.get('files_scanned_total', task='Docs') == 2
+    assert metrics.get('files_matched_total', task='Docs') == 1
+    assert metrics.get('files_moved_total', task='Docs') == 1
+    assert metrics.get('bytes_moved_total', task='Docs') == 5
+    assert metrics.get('move_seconds', task='Docs').count == 1
+
+@patch('dirconfig.initiate_backup')
+@patch('dirconfig.setup_backup_dirs')
+@patch('dirconfig.check_and_install_urbackup_client', side_effect=RuntimeError('boom'))
+def test_backup_task_records_failed_runs(mock_check, mock_setup, mock_initiate):
+    metrics.reset()
+    with pytest.raises(RuntimeError):
+        backup_task({'name': 'client', 'type': 'incremental-file', 'directories': []})
+    assert metrics.get('backup_runs_total', backup='client', status='error') == 1
+    assert metrics.get('backup_seconds', backup='client').count == 1
+
+def test_metrics_http_endpoint():
+    metrics.reset()
+    metrics.inc('events_received_total')
+    server = start_metrics_exporter({'address': '127.0.0.1', 'port': 0})
+    try:
+        body = urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics', timeout=5).read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert 'dirconfig_events_received_total 1' in body
@@ -0,0 +1,77 @@
+from dirconfig import MoveExecutor, MoveResult, copy_file_fast
+from threading import BoundedSemaphore
+import os
+
+def test_move_executor_renames_on_same_device(tmp_path):
+    """
+    Tests that moves on the same file system are executed and reported in the
+    order they were planned.
+    """
+    (tmp_path / 'a.txt').write_text('a')
+    (tmp_path / 'b.txt').write_text('bb')
+    dest = tmp_path / 'dest'
+    executor = MoveExecutor(workers=2)
+
+    results = executor.run([(str(tmp_path / 'a.txt'), str(dest)), (str(tmp_path / 'b.txt'), str(dest))])
+    executor.shutdown()
+
+    assert [result.destination for result in results] == [str(dest / 'a.txt'), str(dest / 'b.txt')]
+    assert all(result.ok for result in results)
+    assert [result.bytes for result in results] == [1, 2]
+    assert (dest / 'b.txt').read_text() == 'bb'
+    assert not (tmp_path / 'a.txt').exists()
+
+def test_move_executor_reports_missing_source(tmp_path):
+    executor = MoveExecutor(workers=1)
+    (tmp_path / 'present.txt').write_text('x')
+
+    results = executor.run([(str(tmp_path / 'missing.txt'), str(tmp_path / 'dest')), (str(tmp_path / 'present.txt'), str(tmp_path / 'dest'))])
+    executor.shutdown()
+
+    assert not results[0].ok
+    assert isinstance(results[0].error, FileNotFoundError)
+    assert results[1].ok
+
+def test_move_executor_cross_device_copy(tmp_path):
+    """
+    Tests the cross-device path: contents and metadata are copied, the temporary
+    file is renamed into place and the source is removed.
+    """
+    source = tmp_path / 'big.bin'
+    source.write_bytes(os.urandom(3 * 1024 * 1024 + 7))
+    os.utime(source, (1_000_000, 1_000_000))
+    (tmp_path / 'dest').mkdir()
+    destination = tmp_path / 'dest' / 'big.bin'
+    data = source.read_bytes()
+    executor = MoveExecutor(workers=1)
+
+    outcome = executor._copy_all([(0, str(source), str(destination), len(data))], BoundedSemaphore(1))
+    executor.shutdown()
+
+    [(position, result)] = outcome
+    assert position == 0
+    assert result[:5] == MoveResult(str(source), str(destination), True, len(data), None)[:5]
+    assert result.seconds > 0
+    assert destination.read_bytes() == data
+    assert os.stat(destination).st_mtime == 1_000_000
+    assert not source.exists()
+    assert not os.path.exists(str(destination) + '.dirconfig-tmp')
+
+def test_move_executor_cross_device_copy_keeps_existing_file(tmp_path):
+    source = tmp_path / 'notes.txt'
+    source.write_text('new')
+    (tmp_path / 'dest').mkdir()
+    (tmp_path / 'dest' / 'notes.txt').write_text('old')
+    executor = MoveExecutor(workers=1)
+
+    [(_, result)] = executor._copy_all([(0, str(source), str(tmp_path / 'dest' / 'notes.txt'), 3)], BoundedSemaphore(1))
+    executor.shutdown()
+
+    assert result.ok and result.destination == str(tmp_path / 'dest' / 'notes (2).txt')
+    assert (tmp_path / 'dest' / 'notes.txt').read_text() == 'old'
+    assert (tmp_path / 'dest' / 'notes (2).txt').read_text() == 'new'
+
+def test_copy_file_fast_empty_file(tmp_path):
+    (tmp_path / 'empty').write_bytes(b'')
+    copy_file_fast(str(tmp_path / 'empty'), str(tmp_path / 'copy'))
+    assert (tmp_path / 'copy').read_bytes() == b''
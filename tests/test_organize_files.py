@@ -1,4 +1,5 @@
-from dirconfig import load_config, organize_files, start_daemon, stop_daemon, ChangeHandler
+from dirconfig import load_config, organize_files, start_daemon, stop_daemon, ChangeHandler, RuleIndex, parse_size, plan_move, scan_source
+from watchdog.events import FileCreatedEvent, FileDeletedEvent, FileMovedEvent
 from unittest.mock import patch
 import tempfile
 import pytest
@@ -76,3 +77,174 @@ def test_organize_files(setup_test_env):
     # Check if the files have been moved to the correct destinations
     assert os.path.exists(text_file_path), "Text file should be moved to 'text_files'"
     assert os.path.exists(image_file_path), "Image file should be moved to 'images'"
+
+def test_change_handler_organizes_only_event_path(setup_test_env):
+    """
+    Tests that ChangeHandler only evaluates the path carried by the event
+    instead of rescanning the whole source directory.
+    """
+    config = load_config(os.path.join(setup_test_env, 'config.yaml'))
+    handler = ChangeHandler(config['tasks'])
+
+    source_dir = os.path.join(setup_test_env, 'test_source')
+    handler.dispatch(FileCreatedEvent(os.path.join(source_dir, 'test.txt')))
+
+    assert os.path.exists(os.path.join(source_dir, 'text_files', 'test.txt'))
+    # The image was not part of the event, so it stays until a reconciliation scan.
+    assert os.path.exists(os.path.join(source_dir, 'image.jpg'))
+
+    handler.reconcile()
+    assert os.path.exists(os.path.join(source_dir, 'images', 'image.jpg'))
+
+def test_change_handler_ignores_events_outside_sources(setup_test_env):
+    """
+    Tests that events in subdirectories of a source (e.g. destinations) and
+    deleted events are not routed to any task.
+    """
+    config = load_config(os.path.join(setup_test_env, 'config.yaml'))
+    handler = ChangeHandler(config['tasks'])
+
+    source_dir = os.path.join(setup_test_env, 'test_source')
+    os.mkdir(os.path.join(source_dir, 'nested'))
+    nested_file = os.path.join(source_dir, 'nested', 'other.txt')
+    with open(nested_file, 'w') as f:
+        f.write("Nested text file.")
+
+    handler.dispatch(FileCreatedEvent(nested_file))
+    handler.dispatch(FileDeletedEvent(os.path.join(source_dir, 'test.txt')))
+
+    assert os.path.exists(nested_file)
+    assert os.path.exists(os.path.join(source_dir, 'test.txt'))
+
+def test_load_config_compiles_rule_index(setup_test_env):
+    """
+    Tests that load_config attaches a compiled rule index to each
+    file-organization task with case-folded extensions and resolved destinations.
+    """
+    config = load_config(os.path.join(setup_test_env, 'config.yaml'))
+    index = config['tasks'][0]['rule_index']
+    source_dir = os.path.join(setup_test_env, 'test_source')
+
+    assert isinstance(index, RuleIndex)
+    assert index.source_path == source_dir
+    assert set(index.by_extension) == {'.txt', '.jpg', '.jpeg'}
+    assert index.match('notes.TXT') == os.path.join(source_dir, 'text_files')
+    assert index.match('photo.jpeg') == os.path.join(source_dir, 'images')
+    assert index.match('archive.zip') is None
+    with pytest.raises(TypeError):
+        index.by_extension['.zip'] = ()
+
+def test_rule_index_predicates(tmp_path):
+    """
+    Tests glob, regex and size predicates and that rules keep their config order.
+    """
+    rules = [
+        {'extension': '.log', 'min_size': '1KB', 'destination': 'big_logs'},
+        {'glob': 'report-*', 'destination': 'reports'},
+        {'extension': '.log', 'destination': 'logs'},
+        {'regex': r'^\d{4}-\d{2}-\d{2}', 'destination': 'dated'},
+    ]
+    index = RuleIndex(rules, str(tmp_path))
+    (tmp_path / 'small.log').write_text('x')
+    (tmp_path / 'large.log').write_text('x' * 2048)
+
+    assert index.match('large.log') == str(tmp_path / 'big_logs')
+    assert index.match('small.log') == str(tmp_path / 'logs')
+    assert index.match('report-q1.pdf') == str(tmp_path / 'reports')
+    assert index.match('2024-01-01-notes.md') == str(tmp_path / 'dated')
+    assert index.match('unrelated.md') is None
+
+def test_parse_size():
+    assert parse_size(10) == 10
+    assert parse_size('2KB') == 2048
+    assert parse_size('1.5 MB') == 1536 * 1024
+    with pytest.raises(ValueError):
+        parse_size('lots')
+
+def test_scan_source_yields_bounded_chunks(tmp_path):
+    """
+    Tests that the scanner only yields regular files, skips directories and
+    hands moves over in chunks no larger than chunk_size.
+    """
+    for i in range(5):
+        (tmp_path / f'file{i}.txt').write_text(str(i))
+    (tmp_path / 'folder.txt').mkdir()
+    index = RuleIndex([{'extension': '.txt', 'destination': 'text_files'}], str(tmp_path))
+
+    chunks = list(scan_source(index, chunk_size=2))
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert sorted(os.path.basename(source) for chunk in chunks for source, _ in chunk) == [f'file{i}.txt' for i in range(5)]
+
+def test_organize_files_with_depth(tmp_path):
+    """
+    Tests that a task with depth organizes files in subdirectories up to that
+    depth but never descends into its own destinations.
+    """
+    (tmp_path / 'a' / 'b').mkdir(parents=True)
+    (tmp_path / 'text_files').mkdir()
+    (tmp_path / 'top.txt').write_text('top')
+    (tmp_path / 'a' / 'one.txt').write_text('one')
+    (tmp_path / 'a' / 'b' / 'two.txt').write_text('two')
+    (tmp_path / 'text_files' / 'done.txt').write_text('done')
+    task = {'type': 'file-organization', 'source': str(tmp_path), 'depth': 1, 'rules': [{'extension': '.txt', 'destination': 'text_files'}]}
+
+    assert organize_files(task) == 2
+    assert sorted(os.listdir(tmp_path / 'text_files')) == ['done.txt', 'one.txt', 'top.txt']
+    assert (tmp_path / 'a' / 'b' / 'two.txt').exists()
+
+def test_same_names_from_subdirectories_are_kept(tmp_path):
+    """
+    Tests that files of the same name from different subdirectories do not
+    replace each other in the destination.
+    """
+    for directory in 'ab':
+        (tmp_path / directory).mkdir()
+        (tmp_path / directory / 'notes.txt').write_text(directory)
+    task = {'type': 'file-organization', 'source': str(tmp_path), 'depth': 1, 'rules': [{'extension': '.txt', 'destination': 'text_files'}]}
+
+    assert organize_files(task) == 2
+    assert sorted(os.listdir(tmp_path / 'text_files')) == ['notes (2).txt', 'notes.txt']
+    assert sorted(path.read_text() for path in (tmp_path / 'text_files').iterdir()) == ['a', 'b']
+
+def test_symlinked_source_is_organized(tmp_path):
+    """
+    Tests that a source configured through a symlink organizes the canonical
+    paths its watch reports, and paths given through the link.
+    """
+    (tmp_path / 'real').mkdir()
+    (tmp_path / 'link').symlink_to(tmp_path / 'real')
+    (tmp_path / 'real' / 'event.txt').write_text('event')
+    (tmp_path / 'real' / 'linked.txt').write_text('linked')
+    task = {'type': 'file-organization', 'source': str(tmp_path / 'link'), 'depth': 1,
+            'rules': [{'extension': '.txt', 'destination': 'text_files'}]}
+    handler = ChangeHandler([task])
+
+    handler.dispatch(FileCreatedEvent(str(tmp_path / 'real' / 'event.txt')))
+    assert os.listdir(tmp_path / 'real' / 'text_files') == ['event.txt']
+    assert handler.events_dropped == 0
+    assert plan_move(task, str(tmp_path / 'link' / 'linked.txt')) == (
+        str(tmp_path / 'real' / 'linked.txt'), str(tmp_path / 'real' / 'text_files'))
+
+def test_tasks_chained_through_a_destination(tmp_path):
+    """
+    Tests that files one task moves into another task's source, and files
+    created there directly, are organized by the other task.
+    """
+    (tmp_path / 'downloads').mkdir()
+    (tmp_path / 'docs').mkdir()
+    tasks = [{'type': 'file-organization', 'source': str(tmp_path / 'downloads'), 'rules': [{'extension': '.pdf', 'destination': '../docs'}]},
+             {'type': 'file-organization', 'source': str(tmp_path / 'docs'), 'rules': [{'extension': '.pdf', 'destination': 'pdf'}]}]
+    handler = ChangeHandler(tasks)
+    assert handler.excluded == (str(tmp_path / 'docs' / 'pdf') + os.sep,)
+
+    (tmp_path / 'downloads' / 'a.pdf').write_text('a')
+    (tmp_path / 'docs' / 'b.pdf').write_text('b')
+    handler.dispatch(FileCreatedEvent(str(tmp_path / 'downloads' / 'a.pdf')))
+    assert (tmp_path / 'docs' / 'a.pdf').exists()
+    handler.dispatch(FileMovedEvent(str(tmp_path / 'downloads' / 'a.pdf'), str(tmp_path / 'docs' / 'a.pdf')))
+    handler.dispatch(FileCreatedEvent(str(tmp_path / 'docs' / 'b.pdf')))
+    assert sorted(os.listdir(tmp_path / 'docs' / 'pdf')) == ['a.pdf', 'b.pdf']
+    # The second move only concerns the task that made it.
+    handler.dispatch(FileMovedEvent(str(tmp_path / 'docs' / 'a.pdf'), str(tmp_path / 'docs' / 'pdf' / 'a.pdf')))
+    assert handler.events_dropped == 1
@@ -0,0 +1,70 @@
+from dirconfig import ChangeHandler, DirectorySnapshot, EventQueue, PollingWatcher, WatchManager
+from unittest.mock import MagicMock, patch
+import time
+import os
+
+def age(path, seconds=60):
+    """Backdate a directory so its mtime is trusted by the snapshot."""
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+def test_snapshot_reports_new_and_changed_files(tmp_path):
+    (tmp_path / 'old.txt').write_text('old')
+    age(tmp_path)
+    snapshot = DirectorySnapshot(str(tmp_path))
+    assert snapshot.poll() == []
+
+    (tmp_path / 'new.txt').write_text('new')
+    assert snapshot.poll() == [str(tmp_path / 'new.txt')]
+    # The directory changed just now, so it is listed again, but nothing else is new.
+    assert snapshot.poll() == []
+
+def test_snapshot_skips_unchanged_directories(tmp_path):
+    for name in ('a', 'b'):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'file.txt').write_text(name)
+        age(tmp_path / name)
+    age(tmp_path)
+    snapshot = DirectorySnapshot(str(tmp_path), depth=1)
+    snapshot.poll()
+
+    with patch('dirconfig.os.scandir', wraps=os.scandir) as scandir:
+        assert snapshot.poll() == []
+    scandir.assert_not_called()
+
+    (tmp_path / 'b' / 'other.txt').write_text('b')
+    with patch('dirconfig.os.scandir', wraps=os.scandir) as scandir:
+        assert snapshot.poll() == [str(tmp_path / 'b' / 'other.txt')]
+    scandir.assert_called_once_with(str(tmp_path / 'b'))
+
+def test_snapshot_respects_depth_and_skip(tmp_path):
+    (tmp_path / 'sub' / 'deeper').mkdir(parents=True)
+    (tmp_path / 'organized').mkdir()
+    snapshot = DirectorySnapshot(str(tmp_path), depth=1, skip=(str(tmp_path / 'organized') + os.sep,))
+    snapshot.poll()
+    for path in ('sub/a.txt', 'sub/deeper/b.txt', 'organized/c.txt', 'd.txt'):
+        (tmp_path / path).write_text('x')
+    assert sorted(snapshot.poll()) == [str(tmp_path / 'd.txt'), str(tmp_path / 'sub' / 'a.txt')]
+
+def test_polling_watcher_feeds_the_handler(tmp_path):
+    tasks = [{'type': 'file-organization', 'source': str(tmp_path), 'watch': 'polling',
+              'rules': [{'extension': '.txt', 'destination': 'text_files'}]}]
+    queue = EventQueue()
+    handler = ChangeHandler(tasks, queue)
+    watcher = PollingWatcher(interval=60)
+    watcher.schedule(handler, str(tmp_path))
+    (tmp_path / 'a.txt').write_text('a')
+    (tmp_path / 'b.jpg').write_text('b')
+    watcher.poll()
+    assert sorted(queue.pending) == [str(tmp_path / 'a.txt'), str(tmp_path / 'b.jpg')]
+    watcher.poll()
+    assert queue.coalesced_count == 0
+
+@patch('dirconfig.inotify_watch_limit', return_value=None)
+def test_tasks_can_select_polling(limit, tmp_path):
+    (tmp_path / 'share').mkdir()
+    tasks = [{'type': 'file-organization', 'source': str(tmp_path), 'depth': 1, 'rules': []},
+             {'type': 'file-organization', 'source': str(tmp_path / 'share'), 'watch': 'polling', 'rules': []}]
+    plan, used = WatchManager(MagicMock(), ChangeHandler(tasks)).plan(tasks)
+    # The share is below a recursive inotify watch but still polled on its own.
+    assert plan == {str(tmp_path): 'recursive', str(tmp_path / 'share'): 'polling'}
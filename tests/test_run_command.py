@@ -0,0 +1,35 @@
+from unittest.mock import patch
+import dirconfig
+import asyncio
+import time
+import sys
+
+def test_run_command_async_captures_output():
+    result = asyncio.run(dirconfig.run_command_async([sys.executable, '-c', 'import sys; print("out"); sys.exit(3)'], 5))
+    assert result.returncode == 3
+    assert result.stdout.strip() == 'out'
+
+def test_run_command_async_kills_on_timeout():
+    started = time.monotonic()
+    result = asyncio.run(dirconfig.run_command_async([sys.executable, '-c', 'import time; time.sleep(30)'], 0.2))
+    assert time.monotonic() - started < 5
+    assert result.returncode != 0
+    assert 'Timed out' in result.stderr
+
+def test_run_command_uses_daemon_loop_from_worker_threads():
+    """
+    Tests that inside the daemon, commands from worker threads run on the
+    event loop instead of through subprocess.run.
+    """
+    async def run():
+        dirconfig.daemon_loop = asyncio.get_running_loop()
+        try:
+            with patch('dirconfig.subprocess.run') as mock_run:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    None, dirconfig.run_command, [sys.executable, '-c', 'print("loop")'])
+            mock_run.assert_not_called()
+            return result
+        finally:
+            dirconfig.daemon_loop = None
+
+    assert asyncio.run(run()).stdout.strip() == 'loop'
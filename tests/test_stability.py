@@ -0,0 +1,121 @@
+from dirconfig import ChangeHandler, EventQueue, StabilityGate
+from watchdog.events import FileCreatedEvent, FileModifiedEvent, FileClosedEvent, FileMovedEvent
+import pytest
+import time
+import os
+
+def age(path, seconds=60):
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+@pytest.fixture
+def handler(tmp_path):
+    tasks = [{'type': 'file-organization', 'source': str(tmp_path), 'rules': [{'extension': '.iso', 'destination': 'images'}]}]
+    handler = ChangeHandler(tasks, EventQueue())
+    handler.gate = StabilityGate(handler.enqueue, quiet=0.05, close_timeout=60, close_events=True)
+    return handler
+
+def test_file_is_released_once_when_closed(handler, tmp_path):
+    path = str(tmp_path / 'big.iso')
+    (tmp_path / 'big.iso').write_bytes(b'x')
+    handler.dispatch(FileCreatedEvent(path))
+    for _ in range(100):
+        handler.dispatch(FileModifiedEvent(path))
+    assert len(handler.queue) == 0
+    assert len(handler.gate) == 1
+
+    handler.dispatch(FileClosedEvent(path))
+    handler.dispatch(FileClosedEvent(path))
+    assert list(handler.queue.pending) == [path]
+    assert handler.queue.received_count == 1
+    assert len(handler.gate) == 0
+
+def test_file_renamed_into_place_is_complete(handler, tmp_path):
+    partial, final = str(tmp_path / 'big.iso.part'), str(tmp_path / 'big.iso')
+    (tmp_path / 'big.iso.part').write_bytes(b'x')
+    handler.dispatch(FileCreatedEvent(partial))
+    (tmp_path / 'big.iso.part').rename(final)
+    handler.dispatch(FileMovedEvent(partial, final))
+    assert list(handler.queue.pending) == [final]
+    assert len(handler.gate) == 0
+
+def test_quiescence_without_close_events(handler, tmp_path):
+    handler.gate.close_events = False
+    file = tmp_path / 'big.iso'
+    file.write_bytes(b'x')
+    handler.dispatch(FileCreatedEvent(str(file)))
+    handler.gate.check()
+    time.sleep(0.1)
+    # Still growing, so the quiet period starts over.
+    file.write_bytes(b'xx')
+    handler.gate.check()
+    assert len(handler.queue) == 0
+    time.sleep(0.1)
+    handler.gate.check()
+    assert list(handler.queue.pending) == [str(file)]
+
+def test_close_expected_files_wait_for_close(handler, tmp_path):
+    file = tmp_path / 'big.iso'
+    file.write_bytes(b'x')
+    handler.dispatch(FileCreatedEvent(str(file)))
+    handler.dispatch(FileModifiedEvent(str(file)))
+    handler.gate.check()
+    time.sleep(0.1)
+    handler.gate.check()
+    assert len(handler.queue) == 0
+
+    # Files reported by a poller never get a close event and settle by quiescence.
+    polled = tmp_path / 'polled.iso'
+    polled.write_bytes(b'x')
+    event = FileCreatedEvent(str(polled))
+    event.is_synthetic = True
+    handler.dispatch(event)
+    handler.gate.check()
+    time.sleep(0.1)
+    handler.gate.check()
+    assert list(handler.queue.pending) == [str(polled)]
+
+def test_vanished_files_are_forgotten(handler, tmp_path):
+    handler.dispatch(FileCreatedEvent(str(tmp_path / 'gone.iso')))
+    handler.gate.check()
+    assert len(handler.gate) == 0
+    assert len(handler.queue) == 0
+
+def test_file_renamed_in_from_elsewhere_settles_quickly(handler, tmp_path):
+    # A rename from an unwatched directory arrives as a created event that no write or close follows.
+    file = tmp_path / 'moved-in.iso'
+    file.write_bytes(b'x')
+    handler.dispatch(FileCreatedEvent(str(file)))
+    handler.gate.check()
+    time.sleep(0.1)
+    handler.gate.check()
+    assert list(handler.queue.pending) == [str(file)]
+
+def test_reconcile_leaves_files_being_written_to_the_gate(handler, tmp_path):
+    old, fresh = tmp_path / 'old.iso', tmp_path / 'fresh.iso'
+    old.write_bytes(b'x')
+    fresh.write_bytes(b'x')
+    age(old)
+    handler.queue = None
+    handler.reconcile()
+    assert (tmp_path / 'images' / 'old.iso').exists()
+    assert fresh.exists()
+    assert len(handler.gate) == 1
+    handler.gate.check()
+    time.sleep(0.1)
+    handler.gate.check()
+    assert (tmp_path / 'images' / 'fresh.iso').exists()
+
+def test_forgotten_paths_leave_no_event_times(handler, tmp_path):
+    handler.gate.forget = handler.forget
+    for i in range(10):
+        partial, final = tmp_path / f'{i}.iso.part', tmp_path / f'{i}.iso'
+        partial.write_bytes(b'x')
+        handler.dispatch(FileCreatedEvent(str(partial)))
+        partial.rename(final)
+        handler.dispatch(FileMovedEvent(str(partial), str(final)))
+    handler.dispatch(FileCreatedEvent(str(tmp_path / 'deleted.tmp')))
+    handler.gate.check()
+    assert sorted(handler.event_times) == sorted(str(tmp_path / f'{i}.iso') for i in range(10))
+    handler.organize_paths(list(handler.queue.pending))
+    assert handler.event_times == {}
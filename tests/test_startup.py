@@ -0,0 +1,45 @@
+import subprocess
+import sys
+import os
+
+# Modules that must only be imported on the code paths that need them.
+HEAVY_MODULES = ['yaml', 'watchdog', 'urbackup', 'requests', 'sqlite3', 'concurrent.futures']
+# Generous ceiling for the cumulative import time of dirconfig; override with
+# DIRCONFIG_IMPORT_BUDGET_MS on slow machines.
+IMPORT_BUDGET_MS = float(os.environ.get('DIRCONFIG_IMPORT_BUDGET_MS', 250))
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_times(statement='import dirconfig'):
+    """Run a statement under -X importtime and return {module: cumulative microseconds}."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], capture_output=True, text=True, cwd=PROJECT_DIR)
+    assert result.returncode == 0, result.stderr
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(cumulative)
+    return times
+
+def test_import_does_not_load_heavy_dependencies():
+    times = import_times()
+    loaded = [module for module in HEAVY_MODULES if module in times]
+    assert loaded == [], f"Importing dirconfig loaded heavy dependencies: {loaded}"
+
+def test_import_time_budget():
+    # Take the best of a few runs to smooth out noise from the machine.
+    best = min(import_times()['dirconfig'] for _ in range(3)) / 1000
+    assert best < IMPORT_BUDGET_MS, f"Importing dirconfig took {best:.1f} ms (budget {IMPORT_BUDGET_MS} ms)"
+
+def test_stop_does_not_load_heavy_dependencies(tmp_path):
+    """
+    Tests that the 'stop' fast path never imports the daemon or backup dependencies.
+    """
+    statement = (
+        "import sys, dirconfig; "
+        f"sys.argv = ['dirconfig', 'stop', '--pid', {str(tmp_path / 'missing.pid')!r}, '--log', {str(tmp_path / 'dirconfig.log')!r}]\n"
+        "try:\n    dirconfig.main()\nexcept SystemExit:\n    pass"
+    )
+    times = import_times(statement)
+    loaded = [module for module in HEAVY_MODULES if module in times]
+    assert loaded == [], f"'dirconfig stop' loaded heavy dependencies: {loaded}"
@@ -0,0 +1,67 @@
+from dirconfig import ChangeHandler, WatchManager, count_directories
+from unittest.mock import MagicMock, patch
+import tempfile
+import pytest
+import shutil
+import os
+
+@pytest.fixture
+def tree():
+    root = tempfile.mkdtemp()
+    for directory in ('a/b/c', 'a/d', 'e'):
+        os.makedirs(os.path.join(root, directory))
+    yield root
+    shutil.rmtree(root)
+
+def test_count_directories(tree):
+    assert count_directories(os.path.join(tree, 'a'), 100) == 4
+    # Counting stops as soon as the limit is exceeded.
+    assert count_directories(tree, 1) == 2
+
+@patch('dirconfig.inotify_watch_limit', return_value=None)
+def test_one_watch_per_source(limit, tree, make_task):
+    a, b, e = (os.path.join(tree, name) for name in ('a', 'a/b', 'e'))
+    tasks = [make_task(a), make_task(a, '.jpg', depth=2), make_task(b), make_task(e), make_task(e + '/../e')]
+    plan, used = WatchManager(MagicMock(), ChangeHandler(tasks)).plan(tasks)
+    # a is watched once, recursively, which also covers b; e is watched once.
+    assert plan == {a: 'recursive', e: 'flat'}
+
+    observer = MagicMock()
+    handler = ChangeHandler(tasks)
+    WatchManager(observer, handler).sync()
+    assert observer.schedule.call_count == 2
+
+@pytest.mark.parametrize('fallback, mode', [('polling', 'polling'), ('flat', 'flat')])
+def test_over_budget_falls_back(fallback, mode, tree, make_task):
+    a, e = os.path.join(tree, 'a'), os.path.join(tree, 'e')
+    tasks = [make_task(a, depth=3), make_task(e, depth=1)]
+    manager = WatchManager(MagicMock(), ChangeHandler(tasks), {'budget': 1.0, 'fallback': fallback})
+    # e needs one watch and a needs four, so only e fits into a budget of three.
+    with patch('dirconfig.inotify_watch_limit', return_value=3):
+        plan, used = manager.plan(tasks)
+    assert plan == {a: mode, e: 'recursive'}
+    assert used == (2 if mode == 'flat' else 1)
+
+def test_sources_below_a_downgraded_root_get_their_own_watch(tree, make_task):
+    a, b, c, d = (os.path.join(tree, name) for name in ('a', 'a/b', 'a/b/c', 'a/d'))
+    tasks = [make_task(a, depth=3), make_task(b, depth=1), make_task(c), make_task(d)]
+    manager = WatchManager(MagicMock(), ChangeHandler(tasks), {'budget': 1.0, 'fallback': 'flat'})
+    # a needs four watches and falls back to a flat watch, which does not cover b or d;
+    # b fits into the rest of the budget and covers c.
+    with patch('dirconfig.inotify_watch_limit', return_value=3):
+        plan, used = manager.plan(tasks)
+    assert plan == {a: 'flat', b: 'recursive', d: 'flat'}
+    assert used == 4
+
+@patch('dirconfig.inotify_watch_limit', return_value=None)
+def test_shared_watch_is_detached_not_unscheduled(limit, tree, make_task):
+    a = os.path.join(tree, 'a')
+    handler = ChangeHandler([make_task(a)])
+    observer = MagicMock()
+    manager = WatchManager(observer, handler)
+    manager.sync()
+    manager.schedule(MagicMock(), a)
+    handler.set_tasks([])
+    manager.sync()
+    observer.remove_handler_for_watch.assert_called_once()
+    observer.unschedule.assert_not_called()
@@ -0,0 +1,82 @@
+from dirconfig import Metrics, WorkerGroup, read_pid_file, shard_tasks, stop_daemon, write_pid_file
+from unittest.mock import patch
+import multiprocessing
+import signal
+import pytest
+import time
+import sys
+
+def crash(index, count):
+    sys.exit(3)
+
+def sleep(index, count):
+    time.sleep(60)
+
+def test_every_task_is_owned_by_one_worker(tmp_path, make_task):
+    tasks = [make_task(tmp_path / name, name=name) for name in 'abcde']
+    shards = [[task['name'] for task in shard_tasks(tasks, worker, 2)] for worker in range(2)]
+    assert shards == [['a', 'c', 'e'], ['b', 'd']]
+
+def test_related_sources_share_a_worker(tmp_path, make_task):
+    tasks = [make_task(tmp_path / 'a', name='outer'),
+             make_task(tmp_path / 'a' / 'inbox', name='nested'),
+             # Moves files into the outer source, so its events have to be dropped there.
+             make_task(tmp_path / 'b', destination='../a/from-b', name='feeder'),
+             make_task(tmp_path / 'c', name='other')]
+    shards = [[task['name'] for task in shard_tasks(tasks, worker, 2)] for worker in range(2)]
+    assert shards == [['outer', 'nested', 'feeder'], ['other']]
+
+def test_metrics_reported_by_workers_are_labelled():
+    metrics = Metrics()
+    metrics.inc('files_moved_total', 2, task='a')
+    worker = Metrics()
+    worker.inc('files_moved_total', 5, task='b')
+    worker.observe('move_seconds', 0.2)
+    metrics.update_remote(1, *worker.snapshot())
+    rendered = metrics.render()
+    assert 'dirconfig_files_moved_total{task="a"} 2' in rendered
+    assert 'dirconfig_files_moved_total{task="b",worker="1"} 5' in rendered
+    assert 'dirconfig_move_seconds_count{worker="1"} 1' in rendered
+
+@patch('dirconfig.RESTART_DELAY', 0.2)
+def test_crashed_workers_are_restarted_with_backoff():
+    group = WorkerGroup(1, crash, context=multiprocessing.get_context('fork'))
+    assert group.check()
+    group.processes[0].join()
+    assert not group.check()
+    assert group.restarts == 1
+    time.sleep(0.3)
+    assert group.check()
+    group.processes[0].join()
+    group.check()
+    # Crashing again right after starting doubles the delay.
+    assert group.delays[0] == pytest.approx(0.8)
+    group.stop()
+
+def test_stop_terminates_workers():
+    group = WorkerGroup(2, sleep, context=multiprocessing.get_context('fork'))
+    group.check()
+    assert group.running() == 2
+    group.stop(timeout=5)
+    assert group.running() == 0
+    assert [process.exitcode for process in group.processes] == [-signal.SIGTERM] * 2
+
+def test_stop_daemon_stops_workers_of_a_dead_supervisor(tmp_path):
+    pid_file = str(tmp_path / 'dirconfig.pid')
+    write_pid_file(pid_file, [100, 101, 102])
+    assert read_pid_file(pid_file) == [100, 101, 102]
+    killed = []
+
+    def kill(pid, signum):
+        if pid == 100:
+            raise ProcessLookupError
+        killed.append(pid)
+
+    with patch('dirconfig.PID_FILE', pid_file), patch('dirconfig.os.kill', side_effect=kill):
+        stop_daemon()
+    assert killed == [101, 102]
+
+    # A live supervisor stops its workers itself.
+    with patch('dirconfig.PID_FILE', pid_file), patch('dirconfig.os.kill') as kill:
+        stop_daemon()
+    kill.assert_called_once_with(100, signal.SIGTERM)